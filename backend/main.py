@@ -6,8 +6,10 @@ from src.Routes.resume_routes import resume_bp
 from src.Routes.user_routes import auth_bp
 from src.Routes.drive_routes import drive_bp
 from src.Routes.chatbot_routes import chatbot_bp
+from src.Routes.llm_routes import llm_bp
 from src.Controllers.allresumes_controller import get_allresumes_controller
 from src.Controllers import interview_controller
+from src.SocketIO.SocketIO_Instance import socketio
 
 # for coding-assessment
 from src.CodingAssessment.Routes.problem_routes import problem_bp
@@ -19,6 +21,9 @@ from src.Utils.Database import db
 
 app = Flask(__name__, static_folder="static", static_url_path="/static")
 
+# SocketIO carries ingestion progress events emitted by Celery workers
+socketio.init_app(app)
+
 
 # Enable CORS
 CORS(
@@ -42,6 +47,7 @@ app.register_blueprint(resume_bp, url_prefix="/api/resume")
 app.register_blueprint(auth_bp, url_prefix="/api/user")
 app.register_blueprint(drive_bp, url_prefix = "/api/drive")
 app.register_blueprint(chatbot_bp, url_prefix="/api/chatbot")
+app.register_blueprint(llm_bp, url_prefix="/api/llm")
 
 # for coding-assessment
 app.register_blueprint(problem_bp, url_prefix="/api/coding-assessment/problem")
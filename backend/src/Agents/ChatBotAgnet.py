@@ -1,10 +1,21 @@
-from src.LLM.Groq import GroqLLM
+from src.LLM.CircuitBreaker import CircuitOpenError
+from src.LLM.Registry import get_model
 from src.Prompts.PromptBuilder import PromptBuilder
 
+# Sent instead of an LLM reply while the provider's circuit is open
+FALLBACK_REPLY = (
+    "HireKruit automates hiring from resume collection to shortlisting, interviews and selection. "
+    "I can't answer in more detail right now, please try again in a minute."
+)
+
 class ChatBotAgent:
     def __init__(self):
         self.prompt_builder = PromptBuilder()
-        self.llm = GroqLLM().get_model()
+
+    @property
+    def llm(self):
+        # Looked up per call: the agent is created at import time, before server workers fork
+        return get_model()
 
     def get_reply(self, user_message: str) -> str:
         """
@@ -29,7 +40,11 @@ class ChatBotAgent:
         messages = self.prompt_builder.build(system_prompt, human_prompt)
 
         # Call Groq LLM
-        response = self.llm.invoke(messages)
+        try:
+            response = self.llm.invoke(messages, agent="chatbot")
+        except CircuitOpenError as e:
+            print(f"Chatbot fallback reply: {e}")
+            return FALLBACK_REPLY
 
         # Extract reply content
         try:
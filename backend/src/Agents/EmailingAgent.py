@@ -83,6 +83,10 @@ class EmailingAgent:
                 elif person.get("resume_shortlisted") == "no":
                     template = templates["not_shortlisted"]
                     print(f"\nProcessing NOT SHORTLISTED candidate: {candidate_info['name']}")
+                elif person.get("resume_shortlisted") == "prefilter_rejected":
+                    # Rejected by the lexical pre-filter without an LLM score; a recruiter reviews these
+                    print(f"✗ Skipping candidate {candidate_info['name']} - rejected by the pre-filter, pending review")
+                    continue
                 else:
                     print(f"✗ Skipping candidate {candidate_info['name']} - no shortlist status")
                     continue
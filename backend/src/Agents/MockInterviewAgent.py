@@ -1,16 +1,39 @@
-from src.LLM.Groq import GroqLLM 
+from typing import Literal
+from pydantic import BaseModel, field_validator
+from src.LLM.Base import run_sync
+from src.LLM.Registry import get_model
+from src.LLM.StructuredOutput import StructuredOutputParser
 from src.Prompts.PromptBuilder import PromptBuilder
 from src.Utils.Database import db
-import json
+from src.Utils.PromptCompactor import PromptCompactor
+import os
+from functools import partial
 
-groq = GroqLLM()
-llm = groq.get_model()
+# The resume is only a secondary reference here, so it gets a small share of the prompt
+MOCK_INTERVIEW_RESUME_TOKEN_BUDGET = int(os.getenv("MOCK_INTERVIEW_RESUME_TOKEN_BUDGET", 800))
+resume_compactor = PromptCompactor(MOCK_INTERVIEW_RESUME_TOKEN_BUDGET)
 
 
+class InterviewEvaluation(BaseModel):
+    decision: Literal["SELECT", "REJECT"]
+    feedback: str
+
+    @field_validator("decision", mode="before")
+    @classmethod
+    def normalize_decision(cls, value):
+        return str(value).strip().upper()
+
+
+output_parser = StructuredOutputParser("mock_interview")
+
 
 class MockInterviewAgent:
 
-    def evaluate_interview(self, resume_text, transcript):
+    def evaluate_interview(self, resume_text, transcript, drive_id=None):
+        """Sync entry point for aevaluate_interview (Flask controllers)."""
+        return run_sync(self.aevaluate_interview(resume_text, transcript, drive_id=drive_id), get_model())
+
+    async def aevaluate_interview(self, resume_text, transcript, drive_id=None):
         print("Evaluating interview MockInterview agent ...")
         
         system_message = """
@@ -63,9 +86,12 @@ class MockInterviewAgent:
             }
             """
 
+        compacted = resume_compactor.compact(resume_text or "")
+        print(f"Resume compacted from {compacted['tokens_before']} to {compacted['tokens_after']} tokens")
+
         human_message = f"""
             **CANDIDATE RESUME (For Reference Only):**
-            {resume_text}
+            {compacted["text"]}
 
             **INTERVIEW CONVERSATION (Primary Evaluation Source):**
             {transcript}
@@ -84,16 +110,16 @@ class MockInterviewAgent:
 
         # Build prompt with system + human message
         prompt = PromptBuilder.build(system_message, human_message)
-        response = llm.invoke(prompt)
+        invoke = partial(get_model().ainvoke, agent="mock_interview", drive_id=drive_id)
+        response = await invoke(prompt)
 
-        # Safe JSON parsing
-        try:
-            result = json.loads(response.content.strip())
-            print("Evaluation Result:", result)
-        except Exception:
+        # Repaired locally where possible, re-asked once before giving up
+        result = await output_parser.aparse(response, InterviewEvaluation, reask=invoke)
+        if result is None:
             result = {
                 "decision": "REJECT",
                 "feedback": "Could not parse structured output."
             }
+        print("Evaluation Result:", result)
 
         return result
@@ -1,124 +1,266 @@
-import fitz
-import json
-import requests
+import asyncio
+import os
 import io
-from datetime import datetime
-from src.LLM.Groq import GroqLLM
+from functools import partial
+from typing import Optional
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from src.LLM.CircuitBreaker import CircuitOpenError
+from src.LLM.Base import run_sync
+from src.LLM.Registry import get_model
+from src.LLM.StructuredOutput import StructuredOutputParser
 from src.Prompts.PromptBuilder import PromptBuilder
-from src.Utils.Database import db
+from src.Utils.Pipeline import PipelineStage, StagedPipeline
+from src.Utils.ResumeCache import ResumeCache, hash_pdf
+from src.Utils.ResumeFieldExtractor import extract_fields
+from src.Utils.PromptCompactor import PromptCompactor
+from src.Utils.PdfTextExtractor import pdf_extractor
+from src.Utils.DownloadClient import download_client
+from src.Utils.CandidateWriter import CandidateBatchWriter, INTAKE_PERSIST_BATCH_SIZE
 from src.Model.Candidate import create_candidate
-from src.Model.DriveCandidate import create_drive_candidate
 
-groq = GroqLLM()
+load_dotenv()
+
+# Per-stage concurrency limits for the intake pipeline
+INTAKE_DOWNLOAD_CONCURRENCY = int(os.getenv("INTAKE_DOWNLOAD_CONCURRENCY", 8))
+INTAKE_EXTRACT_CONCURRENCY = int(os.getenv("INTAKE_EXTRACT_CONCURRENCY", 4))
+INTAKE_LLM_CONCURRENCY = int(os.getenv("INTAKE_LLM_CONCURRENCY", 4))
+
+# The LLM fallback only needs the resume header and a little context to find name and email
+INTAKE_PROMPT_TOKEN_BUDGET = int(os.getenv("INTAKE_PROMPT_TOKEN_BUDGET", 1000))
+
+# Below this confidence the local extractor defers to the LLM for name/email
+INTAKE_FASTPATH_MIN_CONFIDENCE = float(os.getenv("INTAKE_FASTPATH_MIN_CONFIDENCE", 0.9))
+
+# The resume text is cleaned locally, so the LLM only returns name and email
+# instead of echoing the whole resume back as resume_content.
+SYSTEM_PROMPT = """
+    You are a Resume Information Extraction Agent.
+    Your task is to carefully extract structured candidate details
+    from raw resume text.
+
+    Extraction Rules:
+    - Extract the **full candidate name** exactly as written in the resume header or first lines.
+    - Extract the **primary email address** in valid format (local@domain).
+    * Ignore prefixes/symbols around emails (like 'R username@gmail.com' -> 'username@gmail.com').
+    * If multiple emails, choose the personal Gmail/Outlook one.
+
+    Output format:
+    Return ONLY **valid JSON** without any extra characters, text, explanation, or formatting.
+    Do NOT include markdown, code blocks, or annotations like ```json```.
+    Just output the JSON object, nothing else.
+
+    Example :
+    {
+    "name": "<Candidate Name>",
+    "email": "<Candidate Email>"
+    }
+"""
+
+
+class CandidateFields(BaseModel):
+    name: Optional[str] = None
+    email: Optional[str] = None
+
+
+output_parser = StructuredOutputParser("resume_intake")
+
 
 class ResumeIntakeAgent:
     def __init__(self):
         self.prompt_builder = PromptBuilder()
-        self.llm = groq.get_model()
+        self.llm = get_model()
+        self.resume_cache = ResumeCache()
+        self.compactor = PromptCompactor(INTAKE_PROMPT_TOKEN_BUDGET)
+        # Filled by process_resumes: per-resume failures and per-stage throughput
+        self.failures = []
+        self.stage_stats = []
+        self.cache_hits = 0
+        self.fastpath_hits = 0
 
     def download_pdf(self, url):
     # Ensure PDF is served correctly as raw file
         if "/image/upload/" in url:
             url = url.replace("/image/upload/", "/raw/upload/")
 
-        response = requests.get(url, stream=True)
-
-        if response.status_code == 200:
-            return response.content
-        
-        raise Exception(f"Failed to download PDF: {url}")
+        return download_client.download(url)
 
     def extract_text(self, pdf_bytes):
         """Extract readable text from PDF bytes"""
-        text = ""
-        with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf:
-            for page in pdf:
-                text += page.get_text()
-        return text.strip()
+        return pdf_extractor.extract(pdf_bytes)
 
-    def process_resumes(self, resume_urls, drive_id):
-        candidates = []
+    # ---------- Pipeline stages ----------
+    # Each stage takes the job dict of one resume, adds its output and passes it on.
+
+    def _download_stage(self, job):
+        print(f"Processing resume from Cloudinary URL: {job['resume_url']}")
+        pdf_bytes = self.download_pdf(job["resume_url"])
+        job["content_hash"] = hash_pdf(pdf_bytes)
+
+        # Same PDF seen before: reuse its parse and go straight to persistence
+        cached = self.resume_cache.get(job["content_hash"])
+        if cached:
+            print(f"♻️ Resume cache hit for: {job['resume_url']}")
+            job["cache_hit"] = True
+            job["raw_text"] = cached.get("raw_text", "")
+            job["llm_output"] = {
+                "name": cached["name"],
+                "email": cached["email"],
+                "resume_content": cached["resume_content"]
+            }
+            return job
+
+        job["pdf_bytes"] = pdf_bytes
+        return job
+
+    def _extract_stage(self, job):
+        if job.get("cache_hit"):
+            return job
+        job["raw_text"] = self.extract_text(job.pop("pdf_bytes"))
+        return job
 
-        system_prompt = """
-            You are a Resume Information Extraction Agent.
-            Your task is to carefully extract structured candidate details
-            from raw resume text.
-
-            Extraction Rules:
-            - Extract the **full candidate name** exactly as written in the resume header or first lines.
-            - Extract the **primary email address** in valid format (local@domain).
-            * Ignore prefixes/symbols around emails (like 'R username@gmail.com' -> 'username@gmail.com').
-            * If multiple emails, choose the personal Gmail/Outlook one.
-            - Keep the **full resume content** as a plain text string with the following processing:
-            * Remove any special or non-printable characters such as unusual symbols (for example: '↕', 'ï') that can cause issues in JSON encoding.
-            * Keep standard punctuation, letters, numbers, and common formatting like newlines.
-            * Ensure the text is clean and free from characters that can break JSON parsing.
-            * Preserve the information but remove decorative or corrupted characters.
-
-            Output format:
-            Return ONLY **valid JSON** without any extra characters, text, explanation, or formatting.
-            Do NOT include markdown, code blocks, or annotations like ```json```.
-            Just output the JSON object, nothing else.
-
-            Example : 
-            {
-            "name": "<Candidate Name>",
-            "email": "<Candidate Email>",
-            "resume_content": "<Cleaned Resume Content>"
+    def _parse_stage(self, job):
+        if job.get("cache_hit"):
+            return job
+
+        fields = extract_fields(job["raw_text"])
+        job["local_fields"] = fields
+        if fields["confidence"] >= INTAKE_FASTPATH_MIN_CONFIDENCE:
+            job["fastpath"] = True
+            job["llm_output"] = {
+                "name": fields["name"],
+                "email": fields["email"],
+                "resume_content": fields["resume_content"]
+            }
+        return job
+
+    async def _llm_stage(self, job):
+        if job.get("cache_hit"):
+            return job
+
+        fields = job["local_fields"]
+        if not job.get("fastpath"):
+            print(f"Low local extraction confidence ({fields['confidence']}), asking LLM: {job['resume_url']}")
+            compacted = self.compactor.compact(fields["resume_content"])
+            human_prompt = f"Extract candidate information:\n\n{compacted['text']}"
+            messages = self.prompt_builder.build(SYSTEM_PROMPT, human_prompt)
+            invoke = partial(self.llm.ainvoke, agent="resume_intake", drive_id=job.get("drive_id"))
+            response = await invoke(messages)
+
+            # An unusable reply still leaves the locally extracted fields
+            llm_fields = await output_parser.aparse(response, CandidateFields, reask=invoke)
+            if llm_fields is None:
+                print(f"❌ LLM returned invalid JSON for: {job['resume_url']}, using local fields")
+                llm_fields = {}
+
+            job["llm_output"] = {
+                "name": llm_fields.get("name") or fields["name"],
+                "email": llm_fields.get("email") or fields["email"],
+                "resume_content": fields["resume_content"]
             }
+
+        llm_output = job["llm_output"]
+        if not llm_output["email"]:
+            raise ValueError("No email address found in resume")
+
+        # Blocking Mongo write, kept off the event loop
+        await asyncio.to_thread(
+            self.resume_cache.put,
+            job["content_hash"],
+            raw_text=job["raw_text"],
+            name=llm_output["name"],
+            email=llm_output["email"],
+            resume_content=llm_output["resume_content"]
+        )
+        return job
+
+    async def _persist_stage(self, job):
+        llm_output = job["llm_output"]
+
+        candidate_data = create_candidate(
+            name=llm_output["name"],
+            email=llm_output["email"],
+            resume_content=llm_output["resume_content"],
+            resume_url=job["resume_url"]  # ✅ Store Cloudinary PDF link
+        )
+
+        # Batched with other resumes: candidate upsert, id lookup and drive-candidate upsert
+        job["candidate"] = await self._writer.write(candidate_data)
+        return job
+
+    def process_resumes(self, resume_urls, drive_id, on_progress=None):
+        """Sync entry point for aprocess_resumes (Celery tasks, orchestrator)."""
+        return run_sync(self.aprocess_resumes(resume_urls, drive_id, on_progress=on_progress), self.llm)
+
+    async def aprocess_resumes(self, resume_urls, drive_id, on_progress=None):
         """
+        Download, extract, parse and store every resume through a staged pipeline.
+        Returns the stored candidates in upload order; resumes that failed are
+        skipped and recorded in self.failures with the stage that failed.
+        on_progress, if given, is called with a summary dict as each resume finishes.
+        Resumes that hit an open LLM circuit are not failures: once the rest are
+        stored, CircuitOpenError is raised so the job can be deferred and rerun
+        (stored resumes then come from the resume cache).
+        """
+        pipeline = StagedPipeline([
+            PipelineStage("download", self._download_stage, INTAKE_DOWNLOAD_CONCURRENCY),
+            PipelineStage("extract", self._extract_stage, INTAKE_EXTRACT_CONCURRENCY),
+            PipelineStage("parse", self._parse_stage, INTAKE_EXTRACT_CONCURRENCY),
+            PipelineStage("llm", self._llm_stage, INTAKE_LLM_CONCURRENCY),
+            # Persist admits a full batch so the writer can group-commit it
+            PipelineStage("persist", self._persist_stage, INTAKE_PERSIST_BATCH_SIZE),
+        ])
+        self._writer = CandidateBatchWriter(drive_id)
+
+        jobs = [{"resume_url": resume_url, "drive_id": drive_id} for resume_url in resume_urls]
+        def report(result):
+            if not on_progress or isinstance(result.error, CircuitOpenError):
+                return
+            on_progress({
+                "resume_url": result.item["resume_url"],
+                "status": "processed" if result.ok else "failed",
+                "cache_hit": bool(result.ok and result.value.get("cache_hit")),
+                "stage": result.failed_stage,
+                "error": str(result.error) if result.error else None
+            })
+
+        results = await pipeline.arun(jobs, on_result=report)
+
+        candidates = []
+        self.failures = []
+        self.cache_hits = 0
+        self.fastpath_hits = 0
+        deferred = []
+        for result in results:
+            if result.ok:
+                candidates.append(result.value["candidate"])
+                if result.value.get("cache_hit"):
+                    self.cache_hits += 1
+                elif result.value.get("fastpath"):
+                    self.fastpath_hits += 1
+            elif isinstance(result.error, CircuitOpenError):
+                deferred.append(result.error)
+            else:
+                print(f"❌ Resume failed at {result.failed_stage}: {result.item['resume_url']} ({result.error})")
+                self.failures.append({
+                    "resume_url": result.item["resume_url"],
+                    "stage": result.failed_stage,
+                    "error": str(result.error)
+                })
+
+        self.stage_stats = pipeline.stats()
+        print(f"Persisted candidates in {self._writer.flushes} batch flushes")
+        for stage in self.stage_stats:
+            print(f"Intake stage stats: {stage}")
+        print(f"LLM prompt compaction: {self.compactor.stats()}")
+        print(f"LLM structured output: {output_parser.stats()}")
+        print(
+            f"Processed {len(candidates)} resumes ({self.cache_hits} from cache, "
+            f"{self.fastpath_hits} without LLM), {len(self.failures)} failed"
+        )
 
-        for resume_url in resume_urls:
-            print(f"Processing resume from Cloudinary URL: {resume_url}")
-
-            pdf_bytes = self.download_pdf(resume_url)
-            raw_text = self.extract_text(pdf_bytes)
-
-            human_prompt = f"Extract candidate information:\n\n{raw_text}"
-            messages = self.prompt_builder.build(system_prompt, human_prompt)
-            response = self.llm.invoke(messages)
-
-            try:
-                llm_output = json.loads(response.content.strip())
-
-                candidate_data = create_candidate(
-                    name=llm_output["name"],
-                    email=llm_output["email"],
-                    resume_content=llm_output["resume_content"],
-                    resume_url=resume_url  # ✅ Store Cloudinary PDF link
-                )
-
-                # Check & keep created_at history
-                existing = db.candidates.find_one({"email": candidate_data["email"]})
-                if existing:
-                    candidate_data["created_at"] = existing["created_at"]
-                else:
-                    candidate_data["created_at"] = datetime.utcnow()
-
-                # Save candidate
-                db.candidates.update_one(
-                    {"email": candidate_data["email"]},
-                    {"$set": candidate_data},
-                    upsert=True
-                )
-
-                # Fetch stored candidate ID
-                stored = db.candidates.find_one({"email": candidate_data["email"]})
-                candidate_data["candidate_id"] = str(stored["_id"])
-
-                # Create drive-candidate entry
-                drive_entry = create_drive_candidate(candidate_id=candidate_data["candidate_id"], drive_id=drive_id)
-                db.drive_candidates.update_one(
-                    {"candidate_id": candidate_data["candidate_id"], "drive_id": drive_id},
-                    {"$set": drive_entry},
-                    upsert=True
-                )
-
-                candidates.append(candidate_data)
-
-            except json.JSONDecodeError:
-                print(f"❌ LLM returned invalid JSON for: {resume_url}")
-                print(response.content)
-                continue
+        if deferred:
+            print(f"⏸ {len(deferred)} resumes deferred, LLM circuit open")
+            raise CircuitOpenError(max(error.retry_after for error in deferred))
 
         return candidates
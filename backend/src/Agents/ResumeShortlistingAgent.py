@@ -1,36 +1,190 @@
-import json
+import asyncio
+import os
 from datetime import datetime
+from typing import Literal, Union
 
 from bson import ObjectId
-from src.LLM.Groq import GroqLLM
+from pymongo import UpdateOne
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field, field_validator
+from src.LLM.Base import run_sync
+from src.LLM.CircuitBreaker import CircuitOpenError
+from src.LLM.Registry import get_llm, get_model
+from src.LLM.StructuredOutput import StructuredOutputParser
+from src.LLM.RateLimit import GROQ_TOKENS_PER_MINUTE
 from src.Prompts.PromptBuilder import PromptBuilder
 from src.Utils.Database import db  # Import the database
+from src.Utils.ScoreCache import ScoreCache, build_score_key, build_score_fingerprint
+from src.Utils.LexicalRanker import LexicalRanker
+from src.Utils.PromptCompactor import PromptCompactor, count_tokens
 
-groq = GroqLLM()
+load_dotenv()
+
+# Max candidates scored at once; the Groq quota itself is enforced by the shared LLM client
+SHORTLIST_CONCURRENCY = int(os.getenv("SHORTLIST_CONCURRENCY", 4))
+
+# Local lexical pre-filter: resumes are ranked by BM25 over the drive's skills and scored
+# best first. Those matching none of the skills (or fewer than SHORTLIST_PREFILTER_MIN_COVERAGE
+# of them) skip the LLM, as do all but the best SHORTLIST_PREFILTER_TOP_K when that is > 0.
+# Skipped candidates are stored as prefilter_rejected for review; force_rescore scores them
+SHORTLIST_PREFILTER_ENABLED = os.getenv("SHORTLIST_PREFILTER_ENABLED", "true").lower() == "true"
+SHORTLIST_PREFILTER_MIN_COVERAGE = float(os.getenv("SHORTLIST_PREFILTER_MIN_COVERAGE", 0))
+SHORTLIST_PREFILTER_TOP_K = int(os.getenv("SHORTLIST_PREFILTER_TOP_K", 0))
+
+# Resumes are compacted to these token budgets before they go into a scoring prompt
+SHORTLIST_RESUME_TOKEN_BUDGET = int(os.getenv("SHORTLIST_RESUME_TOKEN_BUDGET", 3000))
+SHORTLIST_BATCH_RESUME_TOKEN_BUDGET = int(os.getenv("SHORTLIST_BATCH_RESUME_TOKEN_BUDGET", 1500))
+
+# Batched scoring: several compacted resumes share one request and one copy of the
+# system prompt. Batches are packed to fit the model's context window (and the
+# per-minute token quota, since a single request can never exceed it)
+SHORTLIST_BATCH_ENABLED = os.getenv("SHORTLIST_BATCH_ENABLED", "false").lower() == "true"
+SHORTLIST_BATCH_MAX_SIZE = int(os.getenv("SHORTLIST_BATCH_MAX_SIZE", 10))
+SHORTLIST_CONTEXT_TOKENS = int(os.getenv("SHORTLIST_CONTEXT_TOKENS", 0))  # 0 uses MODEL_CONTEXT_TOKENS
+BATCH_OUTPUT_TOKENS_PER_ITEM = 40
+BATCH_CONTEXT_HEADROOM = 0.8  # count_tokens is approximate, leave room for it being low
+
+MODEL_CONTEXT_TOKENS = {
+    "llama-3.3-70b-versatile": 131072,
+    "llama3-70b-8192": 8192,
+    "llama3-70b-4096": 4096
+}
+
+# Bump whenever the scoring prompt changes so cached scores from the old prompt are not reused
+SHORTLIST_PROMPT_VERSION = "v2"
+
+
+class ShortlistDecision(BaseModel):
+    shortlisted: Literal["yes", "no"]
+    score: Union[int, float] = Field(ge=0, le=100)
+
+    @field_validator("shortlisted", mode="before")
+    @classmethod
+    def normalize_decision(cls, value):
+        if isinstance(value, bool):
+            return "yes" if value else "no"
+        return str(value).strip().lower()
+
+
+class BatchShortlistDecision(ShortlistDecision):
+    candidate_id: str
+
+    @field_validator("candidate_id", mode="before")
+    @classmethod
+    def normalize_candidate_id(cls, value):
+        return str(value).strip()
+
+
+output_parser = StructuredOutputParser("resume_shortlisting")
+batch_output_parser = StructuredOutputParser("resume_shortlisting_batch")
+
+
+def batch_token_budget():
+    """Largest prompt plus expected output, in tokens, that one batched request may use."""
+    context_tokens = SHORTLIST_CONTEXT_TOKENS or MODEL_CONTEXT_TOKENS.get(get_llm().model_name, 8192)
+    budget = int(context_tokens * BATCH_CONTEXT_HEADROOM)
+    if GROQ_TOKENS_PER_MINUTE > 0:
+        budget = min(budget, GROQ_TOKENS_PER_MINUTE)
+    return budget
 
 class ResumeShortlistingAgent:
-    def __init__(self):
+    def __init__(self, max_workers=SHORTLIST_CONCURRENCY):
         self.prompt_builder = PromptBuilder()
-        self.llm = groq.get_model()
+        self.llm = get_model()
+        self.max_workers = max(1, max_workers)
+        self.score_cache = ScoreCache()
+        self.compactor = PromptCompactor(SHORTLIST_RESUME_TOKEN_BUDGET)
+        self.batch_compactor = PromptCompactor(SHORTLIST_BATCH_RESUME_TOKEN_BUDGET)
+        self.cache_hits = 0
+        self.llm_calls_saved = 0
+        self.batch_requests = 0
+        self.batch_retries = 0
+        self.skipped = 0
+        self.resumed = 0
+        self.drive_id = None
+
+    def _fetch_candidates(self, candidates):
+        """Load every drive candidate's resume in one query; returns {candidate_id: candidate document}."""
+        candidate_ids = [ObjectId(candidate.get("candidate_id")) for candidate in candidates]
+        if not candidate_ids:
+            return {}
+        return {
+            str(doc["_id"]): doc
+            for doc in db.candidates.find(
+                {"_id": {"$in": candidate_ids}},
+                {"name": 1, "email": 1, "resume_content": 1}
+            )
+        }
 
-    def shortlist_candidates(self, candidates, keywords, job_role):
+    def _prefilter(self, candidates, keywords, candidate_docs, gate=True):
         """
-        Takes extracted candidate info, keywords list, and job role.
-        Returns shortlisted and not_shortlisted lists.
-        Also updates the shortlist status and resume score in the database.
+        Rank resumes with BM25 over the drive's skills and synonyms.
+        Returns (to_score, rejected, rankings): the drive candidates to send to the
+        LLM best match first, those that skip it, and {candidate_id: ranking}.
+        With gate=False (force_rescore) nobody is rejected, candidates are only ordered.
         """
-        print("ShortlistingAgent called with candidates")
-        shortlisted = []
-        not_shortlisted = []
+        ranker = LexicalRanker(keywords)
+        if not SHORTLIST_PREFILTER_ENABLED or not ranker.skills or not candidates:
+            return candidates, [], {}
+
+        rankings = ranker.rank({
+            candidate.get("candidate_id"): candidate_docs[candidate.get("candidate_id")].get("resume_content", "")
+            for candidate in candidates
+        })
+        ordered = sorted(candidates, key=lambda candidate: -rankings[candidate.get("candidate_id")]["bm25"])
+        if not gate:
+            return ordered, [], rankings
 
-        system_prompt = f"""
+        to_score = []
+        rejected = []
+        for candidate in ordered:
+            ranking = rankings[candidate.get("candidate_id")]
+            if ranking["coverage"] == 0 or ranking["coverage"] < SHORTLIST_PREFILTER_MIN_COVERAGE:
+                ranking["reason"] = "skill_coverage"
+                rejected.append(candidate)
+            elif SHORTLIST_PREFILTER_TOP_K > 0 and len(to_score) >= SHORTLIST_PREFILTER_TOP_K:
+                ranking["reason"] = "top_k"
+                rejected.append(candidate)
+            else:
+                to_score.append(candidate)
+        return to_score, rejected, rankings
+
+    def _system_prompt(self, job_role, keywords, batched=False):
+        if batched:
+            input_section = '1. Several resumes, each introduced by a line of the form "### Candidate <candidate_id>".'
+            output_section = """Output format:
+        Do not return any explanations or additional text.
+        **Must** return ONLY a valid JSON array with exactly one object per candidate:
+        [
+            {
+                "candidate_id": "<candidate_id exactly as given>",
+                "shortlisted": "yes" or "no",
+                "score": <number between 0 and 100>
+            }
+        ]
+
+        Score every candidate independently of the others.
+        Do NOT wrap the response in code blocks or markdown. Return ONLY the raw JSON array."""
+        else:
+            input_section = "1. The candidate's resume text."
+            output_section = """Output format:
+        Do not return any explanations or additional text.
+        **Must** return ONLY a valid JSON object:
+        {
+            "shortlisted": "yes" or "no",
+            "score": <number between 0 and 100>
+        }
+
+        Do NOT wrap the response in code blocks or markdown. Return ONLY the raw JSON object."""
+
+        return f"""
         You are an intelligent Resume Screening Agent.
 
         Job Role: {job_role}
         Required Skills/Keywords: {keywords}
 
         You will receive:
-        1. The candidate's resume text.
+        {input_section}
 
         Your task:
         - Assess how well the candidate fits the {job_role} role, even if skill names or job titles are worded differently.
@@ -47,71 +201,361 @@ class ResumeShortlistingAgent:
            - The resume contains at least 2 distinct projects.
         3. Otherwise, mark them as not shortlisted.
 
-        Output format:
-        Do not return any explanations or additional text.
-        **Must** return ONLY a valid JSON object:
-        {{
-            "shortlisted": "yes" or "no",
-            "score": <number between 0 and 100>
-        }}
+        {output_section}
+        """
+
+    def _cache_key(self, resume_content, keywords, job_role):
+        # Same resume already scored for this role, skill set, model and prompt
+        return build_score_key(resume_content, job_role, keywords, get_llm().model_name, SHORTLIST_PROMPT_VERSION)
+
+    async def _invoke(self, messages):
+        # Quota, retries and backoff are handled by the shared client (src/LLM/RateLimit.py)
+        async with self._llm_slots:
+            return await self.llm.ainvoke(messages, agent="resume_shortlisting", drive_id=self.drive_id)
 
-        Do NOT wrap the response in code blocks or markdown. Return ONLY the raw JSON object.
+    async def _score_candidate(self, system_prompt, candidate_data, keywords, job_role):
         """
-        
-        print("here..........")
-        for candidate in candidates:
-
-            # here first we need to fetch the resume content from candidate
-            # from the drivecandidate first get the candidate id then form candidate fetch the resume content
-            candidate_id = candidate.get("candidate_id")
-            candidate_data = db.candidates.find_one({"_id": ObjectId(candidate_id)})
-            resume_content = candidate_data.get("resume_content", "")
-
-            human_prompt = (
-                f"Here is the candidate's resume content:\n{resume_content}\n\n"
-                "Based on this resume, determine if the candidate is a suitable match for the job role and required skills. "
-                "Provide the match score and shortlist decision."
-            )
+        Score one prefetched candidate with the LLM.
+        Returns (llm_output, from_cache), with llm_output None when the reply is unusable even after repair.
+        """
+        cache_key = self._cache_key(candidate_data.get("resume_content", ""), keywords, job_role)
+        cached = await asyncio.to_thread(self.score_cache.get, cache_key)
+        if cached:
+            return cached, True
 
-            messages = self.prompt_builder.build(system_prompt, human_prompt)
-            response = self.llm.invoke(messages)
-
-            try:
-                llm_output = json.loads(response.content.strip())
-                print("Shortlisting Agent:", llm_output)
-            except json.JSONDecodeError:
-                print(f"Invalid JSON for {candidate.get('resume', 'unknown')}:\n", response.content)
-                continue
-
-            shortlist_status = llm_output.get("shortlisted", "").lower()
-            resume_score = llm_output.get("score", 0)  # Extract the score
-            
-            result = {
-                "resume": candidate_data.get("resume_content", ""),
-                "name": candidate_data.get("name", ""),
-                "email": candidate_data.get("email", ""),
-                "score": resume_score
-            }
+        return await self._score_single(system_prompt, candidate_data, cache_key), False
 
-            # Update the shortlist status and resume score in the database
-            db.drive_candidates.update_one(
-                {"_id": candidate.get("_id")},
-                {"$set": {
-                    "resume_shortlisted": "yes" if shortlist_status == "yes" else "no",
-                    "resume_score": resume_score,  # Store the resume score
-                    "updated_at": datetime.utcnow()
-                }}
+    async def _score_single(self, system_prompt, candidate_data, cache_key):
+        """Score one resume on its own; returns the validated reply or None when it is unusable."""
+        resume_text = self.compactor.compact(candidate_data.get("resume_content", ""))["text"]
+        human_prompt = (
+            f"Here is the candidate's resume content:\n{resume_text}\n\n"
+            "Based on this resume, determine if the candidate is a suitable match for the job role and required skills. "
+            "Provide the match score and shortlist decision."
+        )
+
+        messages = self.prompt_builder.build(system_prompt, human_prompt)
+        response = await self._invoke(messages)
+
+        llm_output = await output_parser.aparse(response, ShortlistDecision, reask=self._invoke)
+        if llm_output is None:
+            print(f"Invalid JSON for {candidate_data.get('email', 'unknown')}:\n", response.content)
+            return None
+        print("Shortlisting Agent:", llm_output)
+
+        await asyncio.to_thread(self.score_cache.put, cache_key, llm_output["shortlisted"], llm_output["score"])
+        return llm_output
+
+    def _resume_block(self, candidate_id, resume_text):
+        return f"### Candidate {candidate_id}\n{resume_text}\n\n"
+
+    def _pack_batches(self, system_prompt, pending, resume_texts):
+        """
+        Greedily group pending (index, candidate, candidate_data, cache_key) entries so
+        each batch's prompt plus its expected output stays within batch_token_budget().
+        A resume too large to share a request still gets a batch of its own.
+        """
+        budget = batch_token_budget()
+        base_tokens = count_tokens(system_prompt)
+        batches = []
+        current, current_tokens = [], base_tokens
+        for entry in pending:
+            candidate_id = entry[1].get("candidate_id")
+            block = self._resume_block(candidate_id, resume_texts[candidate_id])
+            entry_tokens = count_tokens(block) + BATCH_OUTPUT_TOKENS_PER_ITEM
+            if current and (current_tokens + entry_tokens > budget or len(current) >= SHORTLIST_BATCH_MAX_SIZE):
+                batches.append(current)
+                current, current_tokens = [], base_tokens
+            current.append(entry)
+            current_tokens += entry_tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _score_batch(self, system_prompt, batch, resume_texts):
+        """
+        Score one packed batch in a single request.
+        Returns {candidate_id: {"shortlisted", "score"}} for the well-formed items of the reply only.
+        """
+        human_prompt = "".join(
+            self._resume_block(candidate.get("candidate_id"), resume_texts[candidate.get("candidate_id")])
+            for _, candidate, _, _ in batch
+        ) + (
+            "Based on these resumes, determine for each candidate if they are a suitable match for the job role "
+            "and required skills. Provide the match score and shortlist decision for every candidate_id above."
+        )
+
+        messages = self.prompt_builder.build(system_prompt, human_prompt)
+        try:
+            response = await self._invoke(messages)
+            items = await batch_output_parser.aparse(
+                response, BatchShortlistDecision, reask=self._invoke, many=True
             )
+        except CircuitOpenError:
+            # Scoring individually would only fail again per candidate; let the job defer
+            raise
+        except Exception as e:
+            print(f"Batch of {len(batch)} failed, scoring individually:", e)
+            return {}
+        if items is None:
+            print(f"Batch of {len(batch)} did not return a usable JSON array, scoring individually")
+            return {}
+
+        expected = {candidate.get("candidate_id") for _, candidate, _, _ in batch}
+        return {
+            item["candidate_id"]: {"shortlisted": item["shortlisted"], "score": item["score"]}
+            for item in items
+            if item["candidate_id"] in expected
+        }
+
+    async def _score_batched(self, job_role, keywords, candidates, candidate_docs):
+        """
+        Score candidates several resumes per request.
+        Returns the same (llm_output, from_cache) tuples as _score_candidate, in candidate order.
+        Items missing from or malformed in a batch reply are retried one at a time.
+        """
+        scored = [None] * len(candidates)
+        pending = []
+        cache_keys = [
+            self._cache_key(candidate_docs[candidate.get("candidate_id")].get("resume_content", ""), keywords, job_role)
+            for candidate in candidates
+        ]
+        cached_scores = await asyncio.gather(*(asyncio.to_thread(self.score_cache.get, key) for key in cache_keys))
+        for index, (candidate, cache_key, cached) in enumerate(zip(candidates, cache_keys, cached_scores)):
+            candidate_data = candidate_docs[candidate.get("candidate_id")]
+            if cached:
+                scored[index] = (cached, True)
+            else:
+                pending.append((index, candidate, candidate_data, cache_key))
+
+        batch_prompt = self._system_prompt(job_role, keywords, batched=True)
+        # Compacted once per resume: used both for packing and in the prompt itself
+        resume_texts = {
+            candidate.get("candidate_id"): self.batch_compactor.compact(candidate_data.get("resume_content", ""))["text"]
+            for _, candidate, candidate_data, _ in pending
+        }
+        batches = self._pack_batches(batch_prompt, pending, resume_texts)
+        replies = await asyncio.gather(*(self._score_batch(batch_prompt, batch, resume_texts) for batch in batches))
+
+        retry = []
+        for batch, outputs in zip(batches, replies):
+            for entry in batch:
+                index, candidate, candidate_data, cache_key = entry
+                llm_output = outputs.get(candidate.get("candidate_id"))
+                if llm_output is None:
+                    retry.append(entry)
+                    continue
+                await asyncio.to_thread(self.score_cache.put, cache_key, llm_output["shortlisted"], llm_output["score"])
+                scored[index] = (llm_output, False)
+
+        self.batch_requests = len(batches)
+        self.batch_retries = len(retry)
+        print(f"Scored {len(pending)} resumes in {len(batches)} batched requests, retrying {len(retry)} individually")
+
+        if retry:
+            system_prompt = self._system_prompt(job_role, keywords)
+            outputs = await asyncio.gather(*(
+                self._score_single(system_prompt, candidate_data, cache_key)
+                for _, _, candidate_data, cache_key in retry
+            ))
+            for (index, _, _, _), llm_output in zip(retry, outputs):
+                scored[index] = (llm_output, False)
+
+        return scored
+
+    async def _iter_scores(self, system_prompt, job_role, keywords, candidates, candidate_docs):
+        """
+        Yield lists of (drive_candidate, llm_output, from_cache) in candidate order as soon as
+        they are ready: one candidate at a time, or one window of batched requests at a time.
+        """
+        if SHORTLIST_BATCH_ENABLED:
+            # Enough candidates to keep every concurrency slot busy with a full batch
+            window = self.max_workers * SHORTLIST_BATCH_MAX_SIZE
+            for start in range(0, len(candidates), window):
+                chunk = candidates[start:start + window]
+                scored = await self._score_batched(job_role, keywords, chunk, candidate_docs)
+                yield [(candidate, llm_output, from_cache) for candidate, (llm_output, from_cache) in zip(chunk, scored)]
+            return
 
+        # All candidates are scheduled at once (_invoke bounds the LLM concurrency) and
+        # handed back in candidate order, so the database updates run as in the sequential path
+        tasks = [
+            asyncio.ensure_future(self._score_candidate(
+                system_prompt, candidate_docs[candidate.get("candidate_id")], keywords, job_role
+            ))
+            for candidate in candidates
+        ]
+        try:
+            for candidate, task in zip(candidates, tasks):
+                llm_output, from_cache = await task
+                yield [(candidate, llm_output, from_cache)]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def shortlist_candidates(self, candidates, keywords, job_role, force_rescore=False, job_id=None, on_checkpoint=None):
+        """Sync entry point for ashortlist_candidates (Celery tasks, orchestrator)."""
+        return run_sync(self.ashortlist_candidates(
+            candidates, keywords, job_role, force_rescore=force_rescore, job_id=job_id, on_checkpoint=on_checkpoint
+        ), self.llm)
+
+    async def ashortlist_candidates(self, candidates, keywords, job_role, force_rescore=False, job_id=None, on_checkpoint=None):
+        """
+        Takes extracted candidate info, keywords list, and job role.
+        Returns shortlisted and not_shortlisted lists of {"candidate_id", "score"}.
+        Also updates the shortlist status and resume score in the database.
+
+        Candidates already scored against the same resume, role and skills keep
+        their stored result and are only counted as skipped, unless force_rescore is set.
+        Candidates the lexical pre-filter rejects are stored as "prefilter_rejected"
+        without an LLM call and returned in prefilter_rejected; force_rescore scores them.
+
+        When run for a shortlisting job, every stored result is tagged with job_id, so a
+        resumed job skips the candidates an earlier attempt already finished. on_checkpoint
+        receives a list of {"candidate_id", "status", "score"} updates after each write,
+        with status "shortlisted", "not_shortlisted", "prefilter_rejected" or "skipped".
+        """
+        print("ShortlistingAgent called with candidates")
+        shortlisted = []
+        not_shortlisted = []
+        prefilter_rejected = []
+
+        system_prompt = self._system_prompt(job_role, keywords)
+        
+        print("here..........")
+        self.cache_hits = 0
+        self._llm_slots = asyncio.Semaphore(self.max_workers)
+        # Only used to attribute LLM usage; all candidates of one run belong to the same drive
+        drive_ids = {candidate.get("drive_id") for candidate in candidates}
+        self.drive_id = drive_ids.pop() if len(drive_ids) == 1 else None
+
+        # All resumes are loaded up front in a single query
+        candidate_docs = await asyncio.to_thread(self._fetch_candidates, candidates)
+        missing = [candidate for candidate in candidates if candidate.get("candidate_id") not in candidate_docs]
+        for candidate in missing:
+            print(f"Candidate {candidate.get('candidate_id')} not found, skipping")
+        candidates = [candidate for candidate in candidates if candidate.get("candidate_id") in candidate_docs]
+
+        def add_result(candidate_id, shortlist_status, resume_score):
+            result = {"candidate_id": candidate_id, "score": resume_score}
             if shortlist_status == "yes":
                 shortlisted.append(result)
+            elif shortlist_status == "prefilter_rejected":
+                prefilter_rejected.append(result)
             else:
                 not_shortlisted.append(result)
 
+        async def checkpoint(operations, updates):
+            # One bulk write per checkpoint, off the event loop
+            if operations:
+                await asyncio.to_thread(db.drive_candidates.bulk_write, operations, ordered=False)
+            if on_checkpoint and updates:
+                await asyncio.to_thread(on_checkpoint, updates)
+
+        # Resuming a job: candidates it already checkpointed keep their result and are not counted again
+        self.resumed = 0
+        if job_id:
+            finished = [candidate for candidate in candidates if candidate.get("shortlisting_job_id") == job_id]
+            for candidate in finished:
+                add_result(candidate.get("candidate_id"), candidate.get("resume_shortlisted"), candidate.get("resume_score"))
+            self.resumed = len(finished)
+            finished_ids = {candidate["_id"] for candidate in finished}
+            candidates = [candidate for candidate in candidates if candidate["_id"] not in finished_ids]
+            print(f"Resuming shortlisting job {job_id}: {self.resumed} candidates already done")
+
+        # Incremental mode: only new candidates and ones whose resume, role or skills changed are scored
+        fingerprints = {
+            candidate_id: build_score_fingerprint(doc.get("resume_content", ""), job_role, keywords)
+            for candidate_id, doc in candidate_docs.items()
+        }
+        up_to_date = [] if force_rescore else [
+            candidate for candidate in candidates
+            if candidate.get("resume_score") is not None
+            and candidate.get("score_fingerprint") == fingerprints[candidate.get("candidate_id")]
+        ]
+        self.skipped = len(up_to_date)
+        for candidate in up_to_date:
+            add_result(candidate.get("candidate_id"), candidate.get("resume_shortlisted"), candidate.get("resume_score"))
+        up_to_date_ids = {candidate["_id"] for candidate in up_to_date}
+        candidates = [candidate for candidate in candidates if candidate["_id"] not in up_to_date_ids]
+        await checkpoint([
+            UpdateOne({"_id": candidate["_id"]}, {"$set": {"shortlisting_job_id": job_id}})
+            for candidate in up_to_date
+        ] if job_id else [], [
+            {"candidate_id": candidate.get("candidate_id"), "status": "skipped", "score": candidate.get("resume_score")}
+            for candidate in up_to_date
+        ])
+        print(f"Skipping {self.skipped} candidates already scored for this resume, role and skills")
+
+        # Obvious mismatches skip the LLM; they are kept apart from LLM rejections for review
+        candidates, rejected, rankings = self._prefilter(candidates, keywords, candidate_docs, gate=not force_rescore)
+        self.llm_calls_saved = len(rejected)
+        operations = []
+        updates = []
+        for candidate in rejected:
+            operations.append(UpdateOne(
+                {"_id": candidate.get("_id")},
+                {
+                    "$set": {
+                        "resume_shortlisted": "prefilter_rejected",
+                        "resume_score": None,
+                        "prefilter": rankings[candidate.get("candidate_id")],
+                        "shortlisting_job_id": job_id,
+                        "updated_at": datetime.utcnow()
+                    },
+                    # Not an LLM score, so incremental mode must not keep it
+                    "$unset": {"score_fingerprint": ""}
+                }
+            ))
+            add_result(candidate.get("candidate_id"), "prefilter_rejected", None)
+            updates.append({"candidate_id": candidate.get("candidate_id"), "status": "prefilter_rejected", "score": None})
+        await checkpoint(operations, updates)
+        print(f"Pre-filter rejected {len(rejected)} candidates, saving {self.llm_calls_saved} LLM calls")
+
+        async for scored in self._iter_scores(system_prompt, job_role, keywords, candidates, candidate_docs):
+            operations = []
+            updates = []
+            for candidate, llm_output, from_cache in scored:
+                if llm_output is None:
+                    continue
+                if from_cache:
+                    self.cache_hits += 1
+
+                shortlist_status = "yes" if llm_output.get("shortlisted", "").lower() == "yes" else "no"
+                resume_score = llm_output.get("score", 0)  # Extract the score
+
+                # Update the shortlist status and resume score in the database
+                operations.append(UpdateOne(
+                    {"_id": candidate.get("_id")},
+                    {"$set": {
+                        "resume_shortlisted": shortlist_status,
+                        "resume_score": resume_score,  # Store the resume score
+                        "score_fingerprint": fingerprints[candidate.get("candidate_id")],
+                        "prefilter": rankings.get(candidate.get("candidate_id")),
+                        "shortlisting_job_id": job_id,
+                        "updated_at": datetime.utcnow()
+                    }}
+                ))
+                add_result(candidate.get("candidate_id"), shortlist_status, resume_score)
+                updates.append({
+                    "candidate_id": candidate.get("candidate_id"),
+                    "status": "shortlisted" if shortlist_status == "yes" else "not_shortlisted",
+                    "score": resume_score
+                })
+            await checkpoint(operations, updates)
+
         print("shortlisted", len(shortlisted))
         print("not_shortlisted", len(not_shortlisted))
+        print("prefilter_rejected", len(prefilter_rejected))
+        print("scores served from cache", self.cache_hits)
+        print("resume compaction", self.compactor.stats(), self.batch_compactor.stats())
+        print("structured output", output_parser.stats(), batch_output_parser.stats())
 
         return {
             "shortlisted": shortlisted,
-            "not_shortlisted": not_shortlisted
+            "not_shortlisted": not_shortlisted,
+            "prefilter_rejected": prefilter_rejected,
+            "llm_calls_saved": len(prefilter_rejected),
+            "skipped": self.skipped,
+            "resumed": self.resumed
         }
\ No newline at end of file
@@ -1,12 +1,12 @@
+import os
 from bson import ObjectId
 from flask import jsonify, request
 from src.Model.Drive import create_drive, JobType, DriveStatus, RoundStatus
 from src.Model.CodingQuestion import create_coding_question
-from src.Model.DriveCandidate import initialize_candidate_rounds
 from src.Utils.Database import db
-from datetime import datetime
+from datetime import datetime, timedelta
+from src.Model.ShortlistingJob import create_shortlisting_job, format_shortlisting_job, ShortlistingStatus
 from src.Orchestrator.HiringOrchestrator import (
-    shortlist_candidates,
     email_candidates,
     schedule_interviews,
     send_final_selection_emails
@@ -16,9 +16,14 @@ from src.Tasks.tasks import (
     email_candidates_task, 
     send_final_selection_emails_task, 
     schedule_interviews_task,
-    schedule_coding_assessments_task
+    schedule_coding_assessments_task,
+    shortlist_candidates_task
 )
 
+# A queued or running shortlisting job without a checkpoint for this long is
+# assumed dead (e.g. killed worker) and is queued again to resume
+SHORTLISTING_JOB_STALE_SEC = int(os.getenv("SHORTLISTING_JOB_STALE_SEC", 15 * 60))
+
 
 def create_drive_controller():
     """
@@ -135,6 +140,59 @@ def create_drive_controller():
     }), 201
 
 
+def queue_shortlisting_job(drive_id, total, force_rescore=False):
+    """
+    Queue shortlisting for a drive, resuming its unfinished job if there is one.
+    A job that is still making progress is left alone rather than queued twice,
+    whether or not it was forced: two jobs must never score the same drive at once.
+    """
+    job = db.shortlisting_jobs.find_one(
+        {"drive_id": drive_id, "status": {"$ne": ShortlistingStatus.COMPLETED}},
+        sort=[("created_at", -1)]
+    )
+
+    if job and job["status"] != ShortlistingStatus.FAILED and \
+            job["updated_at"] > datetime.utcnow() - timedelta(seconds=SHORTLISTING_JOB_STALE_SEC):
+        print(f"Shortlisting job {job['_id']} is still in progress")
+        return format_shortlisting_job(job)
+
+    if job:
+        job_id = str(job["_id"])
+        db.shortlisting_jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {
+                "status": ShortlistingStatus.QUEUED,
+                # A forced request upgrades the job it resumes
+                "force_rescore": job.get("force_rescore", False) or force_rescore,
+                "updated_at": datetime.utcnow()
+            }}
+        )
+        print(f"Resuming shortlisting job {job_id} from its last checkpoint")
+    else:
+        job_id = str(db.shortlisting_jobs.insert_one(
+            create_shortlisting_job(drive_id, total, force_rescore=force_rescore)
+        ).inserted_id)
+
+    task_result = shortlist_candidates_task.delay(job_id)
+    db.shortlisting_jobs.update_one({"_id": ObjectId(job_id)}, {"$set": {"task_id": task_result.id}})
+    print(f"Shortlisting job {job_id} queued with task ID: {task_result.id}")
+    return format_shortlisting_job(db.shortlisting_jobs.find_one({"_id": ObjectId(job_id)}))
+
+
+def check_shortlisting_completed(drive_id):
+    """
+    Steps that act on shortlisting results (emails, round scheduling) must wait for
+    the drive's latest shortlisting job to complete.
+    Returns (latest job or None, reason they cannot run yet or None).
+    """
+    job = db.shortlisting_jobs.find_one({"drive_id": drive_id}, sort=[("created_at", -1)])
+    if not job:
+        return None, "Resumes have not been shortlisted for this drive yet"
+    if job["status"] != ShortlistingStatus.COMPLETED:
+        return job, f"Shortlisting job {job['_id']} is {ShortlistingStatus(job['status']).value}, wait for it to complete"
+    return job, None
+
+
 def get_drives_by_company(company_id):
     """
     Get all drives for a specific company with round progress.
@@ -226,6 +284,10 @@ def get_drive_by_id(drive_id):
             })
         
         drive["round_progress"] = round_progress
+
+        # Progress of the most recent shortlisting job, if any
+        shortlisting_job = db.shortlisting_jobs.find_one({"drive_id": drive_id}, sort=[("created_at", -1)])
+        drive["shortlisting"] = format_shortlisting_job(shortlisting_job) if shortlisting_job else None
         
         print(f"Drive found successfully: {drive.get('job_id', 'No job_id')}")
         
@@ -319,25 +381,21 @@ def update_drive_status(drive_id):
         # Fetch candidates
         candidates = list(db.drive_candidates.find({"drive_id": drive_id}))
 
+        # Emails and rounds go by resume_shortlisted, which is only final once shortlisting completed
+        if new_status in (DriveStatus.EMAIL_SENT, "ROUND_SCHEDULING"):
+            shortlisting_job, error = check_shortlisting_completed(drive_id)
+            if error:
+                return jsonify({
+                    "error": error,
+                    "shortlisting": format_shortlisting_job(shortlisting_job) if shortlisting_job else None
+                }), 409
+
         # Handle different statuses
+        shortlisting_summary = None
         if new_status == DriveStatus.RESUME_SHORTLISTED:
-            print("Calling shortlisting agent...")
-            shortlist_result = shortlist_candidates(candidates, keywords, job_role)
-            
-            # Update all shortlisted candidates' rounds_status
-            shortlisted_candidates = db.drive_candidates.find(
-                {"drive_id": drive_id, "resume_shortlisted": "yes"}
-            )
-            
-            for candidate in shortlisted_candidates:
-                # Initialize rounds for shortlisted candidates
-                rounds_status = initialize_candidate_rounds(rounds)
-                db.drive_candidates.update_one(
-                    {"_id": candidate["_id"]},
-                    {"$set": {"rounds_status": rounds_status}}
-                )
-            
-            print(f"Initialized round statuses for shortlisted candidates")
+            # By default only new or changed candidates are scored; force_rescore scores everyone again
+            force_rescore = bool(data.get("force_rescore", False))
+            shortlisting_summary = queue_shortlisting_job(drive_id, len(candidates), force_rescore)
 
         elif new_status == DriveStatus.EMAIL_SENT:
             print("Queueing email sending task...")
@@ -457,13 +515,17 @@ def update_drive_status(drive_id):
 
             print(f"Drive status updated successfully to: {new_status}")
 
-            return jsonify({
+            response = {
                 "message": "Drive status updated successfully", 
                 "status": new_status,
                 "drive_id": drive_id,
                 "current_round": current_round,
                 "updated_at": datetime.utcnow().isoformat()
-            }), 200
+            }
+            if shortlisting_summary:
+                response["shortlisting"] = shortlisting_summary
+
+            return jsonify(response), 200
         
     except Exception as e:
         print(f"Error in update_drive_status: {str(e)}")
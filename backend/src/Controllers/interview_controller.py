@@ -2,7 +2,7 @@ import asyncio
 import io, json, os
 from flask import jsonify, request
 from src.Utils.VapiService import upload_resume
-import pdfplumber
+from src.Utils.PdfTextExtractor import pdf_extractor
 
 from dotenv import load_dotenv
 from src.Utils.Database import db
@@ -28,17 +28,12 @@ emailing_agent = EmailingAgent(email_service)
 def extract_resume_text(file):
     """Extract text from uploaded resume (PDF)."""
     print("Extracting resume text...")
-    text = ""
     try:
-        with pdfplumber.open(file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+        text = pdf_extractor.extract(file.read())
     except Exception as e:
         raise RuntimeError(f"Error extracting resume text: {str(e)}")
     print("resume extraction done")
-    return text.strip()
+    return text
 
 
 def upload_resume_controller(file):
@@ -78,7 +73,7 @@ def evaluate_interview_controller(resume_text, transcript, driveId):
                 print(f"Warning: Skipping malformed message: {msg}")
 
         # Call the Mock Interview Agent
-        result = mock_interview_agent.evaluate_interview(resume_text, conversation_only)
+        result = mock_interview_agent.evaluate_interview(resume_text, conversation_only, drive_id=driveId)
 
         decision = result.get("decision", "REJECT")
         feedback = result.get("feedback", "No feedback provided")
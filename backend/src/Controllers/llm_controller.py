@@ -0,0 +1,85 @@
+from bson import ObjectId
+from flask import jsonify
+from src.LLM.CircuitBreaker import CircuitEventLog
+from src.LLM.Registry import registry
+from src.Utils.Database import db
+
+circuit_events = CircuitEventLog(db.llm_circuit_events)
+
+USAGE_FIELDS = ("calls", "cache_hits", "coalesced", "errors", "prompt_tokens", "completion_tokens", "total_tokens", "latency_ms_total")
+
+
+def get_drive_llm_usage(drive_id):
+    """
+    Token, latency and cache usage of every LLM call made for a drive,
+    in total and per agent and model.
+    """
+    try:
+        try:
+            object_id = ObjectId(drive_id)
+        except Exception:
+            return jsonify({"error": "Invalid drive ID format"}), 400
+
+        if not db.drives.find_one({"_id": object_id}, {"_id": 1}):
+            return jsonify({"error": "Drive not found"}), 404
+
+        groups = list(db.llm_usage.aggregate([
+            {"$match": {"drive_id": drive_id}},
+            {"$group": {
+                "_id": {"agent": "$agent", "model": "$model"},
+                "calls": {"$sum": 1},
+                "cache_hits": {"$sum": {"$cond": ["$cache_hit", 1, 0]}},
+                "coalesced": {"$sum": {"$cond": [{"$ifNull": ["$coalesced", False]}, 1, 0]}},
+                "errors": {"$sum": {"$cond": [{"$ifNull": ["$error", False]}, 1, 0]}},
+                "prompt_tokens": {"$sum": "$prompt_tokens"},
+                "completion_tokens": {"$sum": "$completion_tokens"},
+                "total_tokens": {"$sum": "$total_tokens"},
+                "latency_ms_total": {"$sum": "$latency_ms"},
+                "latency_ms_max": {"$max": "$latency_ms"},
+                "first_call_at": {"$min": "$created_at"},
+                "last_call_at": {"$max": "$created_at"}
+            }},
+            {"$sort": {"total_tokens": -1}}
+        ]))
+
+        by_agent = []
+        totals = {field: 0 for field in USAGE_FIELDS}
+        for group in groups:
+            entry = {
+                "agent": group["_id"].get("agent"),
+                "model": group["_id"].get("model"),
+                **{field: group[field] for field in USAGE_FIELDS},
+                "latency_ms_avg": round(group["latency_ms_total"] / group["calls"], 1) if group["calls"] else 0.0,
+                "latency_ms_max": group["latency_ms_max"],
+                "first_call_at": group["first_call_at"].isoformat() if group.get("first_call_at") else None,
+                "last_call_at": group["last_call_at"].isoformat() if group.get("last_call_at") else None
+            }
+            by_agent.append(entry)
+            for field in USAGE_FIELDS:
+                totals[field] += group[field]
+        totals["latency_ms_avg"] = round(totals["latency_ms_total"] / totals["calls"], 1) if totals["calls"] else 0.0
+
+        return jsonify({
+            "drive_id": drive_id,
+            "totals": totals,
+            "by_agent": by_agent
+        }), 200
+
+    except Exception as e:
+        print(f"Error fetching LLM usage for drive {drive_id}: {str(e)}")
+        return jsonify({"error": f"Failed to fetch LLM usage: {str(e)}"}), 500
+
+
+def get_llm_stats():
+    """
+    In-memory LLM counters of this process (usage, cache, rate limiting, structured
+    output, circuit breaker), plus the circuit breaker state of every process
+    (Celery workers included) from the stored transitions.
+    """
+    try:
+        stats = registry.stats()
+        stats["circuit_breakers"] = circuit_events.summary()
+        return jsonify(stats), 200
+    except Exception as e:
+        print(f"Error fetching LLM stats: {str(e)}")
+        return jsonify({"error": f"Failed to fetch LLM stats: {str(e)}"}), 500
@@ -1,10 +1,15 @@
+from bson import ObjectId
 from flask import request, jsonify
-from werkzeug.utils import secure_filename
-import cloudinary.uploader
-from src.Orchestrator.HiringOrchestrator import create_driveCandidate
-from src.Config.cloudinary_config import cloudinary
+from src.Model.IngestionJob import create_ingestion_job, format_ingestion_job
+from src.Utils.Database import db
+from src.Utils.ResumeStorage import upload_resume_files
+from src.Tasks.tasks import ingest_resumes_task
 
 def upload_resumes():
+    """
+    Store the uploaded resumes and queue their ingestion.
+    Returns an ingestion job id right away; the LLM work runs in a Celery task.
+    """
     print("Received request to upload resumes")
     if 'resumes' not in request.files:
         return jsonify({"error": "No files part in the request"}), 400
@@ -18,27 +23,47 @@ def upload_resumes():
     if not files:
         return jsonify({"error": "No files uploaded"}), 400
 
-    uploaded_urls = []
+    if not drive_id:
+        return jsonify({"error": "drive_id is required"}), 400
 
-    for file in files:
-        filename = secure_filename(file.filename)
-        print(f"Uploading {filename} to Cloudinary...")
+    # Read in the request thread, then upload concurrently; results keep file order
+    upload_results = upload_resume_files([(file.filename, file.read()) for file in files])
+    uploaded_urls = [result["url"] for result in upload_results if "url" in result]
+    upload_failures = [result for result in upload_results if "error" in result]
 
-        # Upload PDF/DOC as raw file to Cloudinary
-        result = cloudinary.uploader.upload(
-            file,
-            resource_type="raw",
-            folder="resumes"
-        )
+    if not uploaded_urls:
+        return jsonify({"error": "Failed to upload resumes", "upload_failures": upload_failures}), 502
 
-        resume_url = result["secure_url"]
-        uploaded_urls.append(resume_url)
+    # Queue ingestion of the stored URLs instead of running the agents in the request
+    job = create_ingestion_job(drive_id, uploaded_urls, job_role=job_role, skills=skills)
+    job_id = str(db.ingestion_jobs.insert_one(job).inserted_id)
 
-    # Pass URLs instead of file paths
-    result = create_driveCandidate(uploaded_urls, skills, job_role, drive_id)
+    task_result = ingest_resumes_task.delay(job_id)
+    db.ingestion_jobs.update_one({"_id": ObjectId(job_id)}, {"$set": {"task_id": task_result.id}})
+    print(f"Ingestion job {job_id} queued with task ID: {task_result.id}")
 
     return jsonify({
-        "status": "success",
+        "status": "queued",
+        "job_id": job_id,
         "uploaded_urls": uploaded_urls,
-        "response": result
-    })
+        "upload_failures": upload_failures,
+        "total": len(uploaded_urls)
+    }), 202
+
+
+def get_ingestion_status(job_id):
+    """Return progress counters of a resume ingestion job."""
+    try:
+        try:
+            object_id = ObjectId(job_id)
+        except Exception:
+            return jsonify({"error": "Invalid job ID format"}), 400
+
+        job = db.ingestion_jobs.find_one({"_id": object_id}, {"resume_urls": 0, "settled_urls": 0})
+        if not job:
+            return jsonify({"error": "Ingestion job not found"}), 404
+
+        return jsonify(format_ingestion_job(job)), 200
+    except Exception as e:
+        print(f"Error in get_ingestion_status: {str(e)}")
+        return jsonify({"error": str(e)}), 500
@@ -1,5 +1,11 @@
+import asyncio
 from abc import ABC, abstractmethod
 
+# Per-call options understood by the wrappers in src/LLM; they are removed
+# before a call reaches the provider's model
+CALL_OPTIONS = ("bypass_cache", "agent", "drive_id")
+
+
 class BaseLLM(ABC):
     def __init__(self, model_name: str):
         self.model_name = model_name
@@ -8,3 +14,82 @@ class BaseLLM(ABC):
     def get_model(self):
         """Return the LLM model instance."""
         pass
+
+    def invoke(self, messages, **kwargs):
+        return self.get_model().invoke(messages, **kwargs)
+
+    async def ainvoke(self, messages, **kwargs):
+        return await self.get_model().ainvoke(messages, **kwargs)
+
+    async def abatch(self, inputs, max_concurrency=None, return_exceptions=False, **kwargs):
+        return await abatch(self.get_model(), inputs, max_concurrency, return_exceptions, **kwargs)
+
+
+async def abatch(model, inputs, max_concurrency=None, return_exceptions=False, **kwargs):
+    """
+    ainvoke every message list in inputs on one event loop, at most
+    max_concurrency at a time. Results are in input order; with
+    return_exceptions a failed call yields its exception instead of raising.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def run(messages):
+        if semaphore is None:
+            return await model.ainvoke(messages, **kwargs)
+        async with semaphore:
+            return await model.ainvoke(messages, **kwargs)
+
+    return await asyncio.gather(*(run(messages) for messages in inputs), return_exceptions=return_exceptions)
+
+
+def run_sync(coro, model):
+    """
+    asyncio.run(coro) for sync entry points that call model asynchronously.
+    Clients bound to the new loop (see EventLoopModel.aclose_loop) are closed
+    before the loop ends instead of leaking one connection pool per call.
+    """
+    async def main():
+        try:
+            return await coro
+        finally:
+            # Found through the wrappers' attribute forwarding; only some providers have one
+            aclose_loop = getattr(model, "aclose_loop", None)
+            if aclose_loop is not None:
+                await aclose_loop()
+
+    return asyncio.run(main())
+
+
+class ModelWrapper:
+    """
+    Wraps a chat model (or another wrapper) and exposes the same invoke/ainvoke
+    interface, so wrappers can be stacked around the provider's model.
+    Attributes not defined here are read from the wrapped model.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def _call_kwargs(self, kwargs):
+        if isinstance(self.model, ModelWrapper):
+            return kwargs
+        return {key: value for key, value in kwargs.items() if key not in CALL_OPTIONS}
+
+    def invoke(self, messages, **kwargs):
+        return self.model.invoke(messages, **self._call_kwargs(kwargs))
+
+    async def ainvoke(self, messages, **kwargs):
+        return await self.model.ainvoke(messages, **self._call_kwargs(kwargs))
+
+    def batch(self, inputs, max_concurrency=None, return_exceptions=False, **kwargs):
+        """Sync entry point for abatch; must not be called from a running event loop."""
+        return run_sync(self.abatch(inputs, max_concurrency, return_exceptions, **kwargs), self)
+
+    async def abatch(self, inputs, max_concurrency=None, return_exceptions=False, **kwargs):
+        # Each call goes through this wrapper's own ainvoke (cache, limits, ...)
+        return await abatch(self, inputs, max_concurrency, return_exceptions, **kwargs)
+
+    def __getattr__(self, name):
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime
+from dotenv import load_dotenv
+from langchain.schema.messages import AIMessage
+from pymongo import ASCENDING
+from .Base import CALL_OPTIONS, ModelWrapper
+
+load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL_SEC = int(os.getenv("LLM_CACHE_TTL_SEC", 7 * 24 * 3600))  # 7 days
+LLM_CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_MAX_ENTRIES", 1000))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 50000))  # Mongo tier
+LLM_CACHE_PERSIST = os.getenv("LLM_CACHE_PERSIST", "true").lower() == "true"
+# The Mongo tier's size is checked once every this many writes
+LLM_CACHE_SIZE_CHECK_EVERY = int(os.getenv("LLM_CACHE_SIZE_CHECK_EVERY", 100))
+
+# Only deterministic calls are cached; ChatGroq turns temperature=0 into 1e-8
+MAX_CACHEABLE_TEMPERATURE = 1e-6
+
+
+def _message_payload(message):
+    if isinstance(message, str):
+        return {"type": "human", "content": message}
+    return {"type": getattr(message, "type", type(message).__name__), "content": message.content}
+
+
+def build_cache_key(model_name, messages, params):
+    """Cache key for one call: model, every message (role and content) and the call parameters."""
+    if isinstance(messages, str):
+        messages = [messages]
+    payload = json.dumps({
+        "model": model_name,
+        "messages": [_message_payload(message) for message in messages],
+        "params": params
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_call_key(model, model_name, messages, kwargs):
+    """Cache key for a call to model, or None when its temperature makes replies non-deterministic."""
+    temperature = getattr(model, "temperature", 0) or 0
+    if temperature > MAX_CACHEABLE_TEMPERATURE:
+        return None
+    params = {key: value for key, value in kwargs.items() if key not in CALL_OPTIONS}
+    params["temperature"] = 0
+    return build_cache_key(model_name, messages, params)
+
+
+# Live response caches, so a reply can be evicted from whichever cache served it
+_caches = weakref.WeakSet()
+
+
+def evict_cached_response(response):
+    """
+    Drop a reply from the response cache, e.g. once it failed validation, so the
+    same prompt goes to the model again instead of getting the same reply back.
+    Returns False when response did not come through a cache.
+    """
+    cache_key = (getattr(response, "response_metadata", None) or {}).get("cache_key")
+    if cache_key is None:
+        return False
+    for cache in list(_caches):
+        cache.evict(cache_key)
+    return True
+
+
+class MemoryTier:
+    """Thread-safe LRU of cache_key -> (stored_at, content) with a TTL."""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry[1]
+
+    def put(self, cache_key, content):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[cache_key] = (time.monotonic(), content)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, cache_key):
+        with self._lock:
+            self._entries.pop(cache_key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MongoTier:
+    """
+    Persistent tier in llm_response_cache; expiry by Mongo's TTL monitor, size
+    bounded by trimming the least recently used entries every few writes.
+    """
+
+    def __init__(self, collection, max_entries, ttl_seconds, size_check_every=LLM_CACHE_SIZE_CHECK_EVERY):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.size_check_every = max(1, size_check_every)
+        self._puts = itertools.count(1)
+        try:
+            self.collection.create_index([("cache_key", ASCENDING)], unique=True)
+            self.collection.create_index([("created_at", ASCENDING)], expireAfterSeconds=ttl_seconds)
+            self.collection.create_index([("last_used_at", ASCENDING)])
+        except Exception as e:
+            print("Failed to create llm_response_cache indexes:", e)
+
+    def get(self, cache_key):
+        entry = self.collection.find_one_and_update(
+            {"cache_key": cache_key},
+            {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}},
+            projection={"_id": 0, "content": 1}
+        )
+        return entry["content"] if entry else None
+
+    def put(self, cache_key, model_name, content):
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {"cache_key": cache_key},
+            {
+                "$set": {"model": model_name, "content": content, "last_used_at": now},
+                "$setOnInsert": {"created_at": now, "hits": 0}
+            },
+            upsert=True
+        )
+        if next(self._puts) % self.size_check_every:
+            return
+        excess = self.collection.estimated_document_count() - self.max_entries
+        if excess > 0:
+            stale = self.collection.find({}, {"_id": 1}).sort("last_used_at", ASCENDING).limit(excess)
+            self.collection.delete_many({"_id": {"$in": [doc["_id"] for doc in stale]}})
+
+    def delete(self, cache_key):
+        self.collection.delete_one({"cache_key": cache_key})
+
+
+class CachedModel(ModelWrapper):
+    """
+    Response cache around a chat model. Checks an in-process LRU, then Mongo,
+    and only calls the model on a miss. Pass bypass_cache=True to a call to
+    skip the lookup (the fresh response still replaces the cached one).
+    Responses carry their cache_key in response_metadata for evict_cached_response.
+    """
+
+    def __init__(self, model, model_name, collection=None,
+                 memory_max_entries=LLM_CACHE_MEMORY_MAX_ENTRIES, max_entries=LLM_CACHE_MAX_ENTRIES,
+                 ttl_seconds=LLM_CACHE_TTL_SEC):
+        super().__init__(model)
+        self.model_name = model_name
+        self.memory = MemoryTier(memory_max_entries, ttl_seconds)
+        self.persistent = MongoTier(collection, max_entries, ttl_seconds) if collection is not None else None
+        self.counters = {
+            "memory_hits": 0, "mongo_hits": 0, "misses": 0, "bypassed": 0, "uncacheable": 0, "evicted": 0, "errors": 0
+        }
+        self._counter_lock = threading.Lock()
+        _caches.add(self)
+
+    def _count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def _cache_key(self, messages, kwargs):
+        return build_call_key(self.model, self.model_name, messages, kwargs)
+
+    def _lookup(self, cache_key):
+        content = self.memory.get(cache_key)
+        if content is not None:
+            self._count("memory_hits")
+            return content
+
+        if self.persistent is not None:
+            try:
+                content = self.persistent.get(cache_key)
+            except Exception as e:
+                self._count("errors")
+                print("LLM cache lookup failed:", e)
+                content = None
+            if content is not None:
+                self._count("mongo_hits")
+                self.memory.put(cache_key, content)
+                return content
+
+        self._count("misses")
+        return None
+
+    def _store(self, cache_key, response):
+        content = getattr(response, "content", None)
+        if not isinstance(content, str) or not content:
+            return
+        if isinstance(getattr(response, "response_metadata", None), dict):
+            response.response_metadata["cache_key"] = cache_key
+        self.memory.put(cache_key, content)
+        if self.persistent is not None:
+            try:
+                self.persistent.put(cache_key, self.model_name, content)
+            except Exception as e:
+                self._count("errors")
+                print("LLM cache store failed:", e)
+
+    def evict(self, cache_key):
+        self._count("evicted")
+        self.memory.delete(cache_key)
+        if self.persistent is not None:
+            try:
+                self.persistent.delete(cache_key)
+            except Exception as e:
+                self._count("errors")
+                print("LLM cache eviction failed:", e)
+
+    def _cached_response(self, cache_key, content):
+        return AIMessage(
+            content=content,
+            response_metadata={"model_name": self.model_name, "cache_hit": True, "cache_key": cache_key}
+        )
+
+    def _prepare(self, messages, kwargs):
+        """Returns (cache_key, bypass); cache_key is None when the call must not be cached."""
+        bypass = kwargs.get("bypass_cache", False)
+        cache_key = self._cache_key(messages, kwargs) if LLM_CACHE_ENABLED else None
+        if cache_key is None:
+            self._count("uncacheable")
+        elif bypass:
+            self._count("bypassed")
+        return cache_key, bypass
+
+    def invoke(self, messages, **kwargs):
+        cache_key, bypass = self._prepare(messages, kwargs)
+        if cache_key is not None and not bypass:
+            content = self._lookup(cache_key)
+            if content is not None:
+                return self._cached_response(cache_key, content)
+
+        response = super().invoke(messages, **kwargs)
+        if cache_key is not None:
+            self._store(cache_key, response)
+        return response
+
+    async def ainvoke(self, messages, **kwargs):
+        cache_key, bypass = self._prepare(messages, kwargs)
+        if cache_key is not None and not bypass:
+            # The Mongo tier is blocking I/O
+            content = await asyncio.to_thread(self._lookup, cache_key)
+            if content is not None:
+                return self._cached_response(cache_key, content)
+
+        response = await super().ainvoke(messages, **kwargs)
+        if cache_key is not None:
+            await asyncio.to_thread(self._store, cache_key, response)
+        return response
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self.counters)
+        hits = counters["memory_hits"] + counters["mongo_hits"]
+        lookups = hits + counters["misses"]
+        counters["memory_entries"] = len(self.memory)
+        counters["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        return counters
@@ -0,0 +1,268 @@
+import os
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from enum import Enum
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING
+from .Base import ModelWrapper
+from .RateLimit import is_retryable
+
+load_dotenv()
+
+LLM_BREAKER_ENABLED = os.getenv("LLM_BREAKER_ENABLED", "true").lower() == "true"
+# Outcomes of the last LLM_BREAKER_WINDOW_SIZE calls (none older than LLM_BREAKER_WINDOW_SEC)
+# decide when to open; at least LLM_BREAKER_MIN_CALLS are needed
+LLM_BREAKER_WINDOW_SIZE = int(os.getenv("LLM_BREAKER_WINDOW_SIZE", 20))
+LLM_BREAKER_WINDOW_SEC = float(os.getenv("LLM_BREAKER_WINDOW_SEC", 120))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", 5))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", 0.5))
+LLM_BREAKER_SLOW_CALL_SEC = float(os.getenv("LLM_BREAKER_SLOW_CALL_SEC", 20))
+LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", 0.5))
+# How long calls fail fast before one trial call is let through
+LLM_BREAKER_OPEN_SEC = float(os.getenv("LLM_BREAKER_OPEN_SEC", 30))
+LLM_BREAKER_HALF_OPEN_CALLS = int(os.getenv("LLM_BREAKER_HALF_OPEN_CALLS", 1))
+LLM_BREAKER_MAX_TRANSITIONS = 50
+# Transitions are also stored in llm_circuit_events, so every process's breaker shows on the metrics endpoint
+LLM_BREAKER_PERSIST = os.getenv("LLM_BREAKER_PERSIST", "true").lower() == "true"
+LLM_BREAKER_EVENTS_TTL_SEC = int(os.getenv("LLM_BREAKER_EVENTS_TTL_SEC", 30 * 24 * 3600))  # 30 days
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit is open."""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"LLM provider unavailable (circuit open), retry in {retry_after:.0f}s")
+
+    def __reduce__(self):
+        # Celery pickles task errors; rebuild from retry_after, not the message
+        return (CircuitOpenError, (self.retry_after,))
+
+
+def is_provider_failure(error):
+    # 429s are our own excess load, handled by the rate limiter, not a sign the provider is down
+    return is_retryable(error) and getattr(error, "status_code", None) != 429
+
+
+class CircuitEventLog:
+    """
+    Breaker transitions of every process (web server and Celery workers), so
+    the metrics endpoint is not limited to the breaker of its own process.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        try:
+            collection.create_index([("at", DESCENDING), ("seq", DESCENDING)])
+            collection.create_index([("created_at", ASCENDING)], expireAfterSeconds=LLM_BREAKER_EVENTS_TTL_SEC)
+        except Exception as e:
+            print("Failed to create llm_circuit_events indexes:", e)
+
+    def save(self, event):
+        # Off the caller's thread: transitions happen under the breaker's lock, often on an event loop
+        threading.Thread(target=self._insert, args=(event,), name="llm-circuit-event", daemon=True).start()
+
+    def _insert(self, event):
+        try:
+            self.collection.insert_one({**event, "created_at": datetime.utcnow()})
+        except Exception as e:
+            print("Failed to store LLM circuit transition:", e)
+
+    def summary(self, limit=LLM_BREAKER_MAX_TRANSITIONS):
+        """Latest state of each process's breaker and the most recent transitions of all of them."""
+        latest = self.collection.aggregate([
+            # seq orders one breaker's transitions within the same millisecond
+            {"$sort": {"at": -1, "seq": -1}},
+            {"$group": {
+                "_id": {"name": "$name", "process": "$process"},
+                "state": {"$first": "$to"},
+                "reason": {"$first": "$reason"},
+                "since": {"$first": "$at"}
+            }},
+            {"$sort": {"since": -1}}
+        ])
+        transitions = self.collection.find({}, {"_id": 0, "created_at": 0}).sort([("at", DESCENDING), ("seq", DESCENDING)]).limit(limit)
+        return {
+            "processes": [
+                {
+                    "name": entry["_id"]["name"],
+                    "process": entry["_id"]["process"],
+                    "state": entry["state"],
+                    "reason": entry["reason"],
+                    "since": entry["since"].isoformat()
+                }
+                for entry in latest
+            ],
+            "transitions": [{**event, "at": event["at"].isoformat()} for event in transitions]
+        }
+
+
+class CircuitBreaker:
+    """
+    closed: calls go through and their outcomes are recorded.
+    open: calls fail fast with CircuitOpenError for LLM_BREAKER_OPEN_SEC.
+    half_open: a few trial calls go through; success closes the circuit,
+    a failure or slow call opens it again.
+    """
+
+    def __init__(self, name, event_log=None):
+        self.name = name
+        self.event_log = event_log
+        self.state = CircuitState.CLOSED
+        self.opened = 0
+        self.rejected = 0
+        self.transitions = deque(maxlen=LLM_BREAKER_MAX_TRANSITIONS)
+        self._outcomes = deque(maxlen=LLM_BREAKER_WINDOW_SIZE)
+        self._opened_at = 0.0
+        self._trials = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def _transition(self, state, reason):
+        print(f"LLM circuit {self.name}: {self.state.value} -> {state.value} ({reason})")
+        event = {
+            "name": self.name,
+            "process": f"{socket.gethostname()}:{os.getpid()}",
+            "from": self.state.value,
+            "to": state.value,
+            "reason": reason,
+            "seq": self._seq,
+            "at": datetime.utcnow()
+        }
+        self._seq += 1
+        self.transitions.append({**event, "at": event["at"].isoformat()})
+        if self.event_log is not None:
+            self.event_log.save(event)
+        self.state = state
+        if state == CircuitState.OPEN:
+            self.opened += 1
+            self._opened_at = time.monotonic()
+        elif state == CircuitState.CLOSED:
+            self._outcomes.clear()
+        self._trials = 0
+
+    def _retry_after(self):
+        return max(0.0, self._opened_at + LLM_BREAKER_OPEN_SEC - time.monotonic())
+
+    def check(self):
+        """Raise CircuitOpenError while open, without taking a trial slot."""
+        with self._lock:
+            if self.state == CircuitState.OPEN and self._retry_after() > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self._retry_after())
+
+    def admit(self):
+        """Let a call through or raise CircuitOpenError."""
+        with self._lock:
+            if self.state == CircuitState.OPEN:
+                if self._retry_after() > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self._retry_after())
+                self._transition(CircuitState.HALF_OPEN, "open period elapsed")
+            if self.state == CircuitState.HALF_OPEN:
+                if self._trials >= LLM_BREAKER_HALF_OPEN_CALLS:
+                    self.rejected += 1
+                    raise CircuitOpenError(LLM_BREAKER_OPEN_SEC)
+                self._trials += 1
+
+    def abandon(self):
+        """A call let through by admit() ended without an outcome (e.g. cancelled)."""
+        with self._lock:
+            if self.state == CircuitState.HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+    def record(self, duration, error=None):
+        failed = error is not None and is_provider_failure(error)
+        slow = duration >= LLM_BREAKER_SLOW_CALL_SEC
+        with self._lock:
+            if self.state == CircuitState.HALF_OPEN:
+                if failed or slow:
+                    self._transition(CircuitState.OPEN, "trial call failed" if failed else f"trial call took {duration:.1f}s")
+                elif error is None:
+                    self._transition(CircuitState.CLOSED, "trial call succeeded")
+                else:
+                    # Not the provider's fault (e.g. a bad request); free the slot for another trial
+                    self._trials -= 1
+                return
+            if self.state != CircuitState.CLOSED:
+                return
+
+            now = time.monotonic()
+            self._outcomes.append((now, failed, slow))
+            while self._outcomes and now - self._outcomes[0][0] > LLM_BREAKER_WINDOW_SEC:
+                self._outcomes.popleft()
+            calls = len(self._outcomes)
+            if calls < LLM_BREAKER_MIN_CALLS:
+                return
+            failure_rate = sum(1 for _, failed, _ in self._outcomes if failed) / calls
+            slow_rate = sum(1 for _, _, slow in self._outcomes if slow) / calls
+            if failure_rate >= LLM_BREAKER_FAILURE_RATE:
+                self._transition(CircuitState.OPEN, f"{failure_rate:.0%} of the last {calls} calls failed")
+            elif slow_rate >= LLM_BREAKER_SLOW_RATE:
+                self._transition(CircuitState.OPEN, f"{slow_rate:.0%} of the last {calls} calls took over {LLM_BREAKER_SLOW_CALL_SEC:.0f}s")
+
+    def stats(self):
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                "state": self.state.value,
+                "retry_after": round(self._retry_after(), 1) if self.state == CircuitState.OPEN else 0,
+                "window_calls": calls,
+                "window_failure_rate": round(sum(1 for _, failed, _ in self._outcomes if failed) / calls, 3) if calls else 0.0,
+                "window_slow_rate": round(sum(1 for _, _, slow in self._outcomes if slow) / calls, 3) if calls else 0.0,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "transitions": list(self.transitions)
+            }
+
+
+class CircuitBreakerModel(ModelWrapper):
+    """
+    Wraps the provider's model directly, so every attempt (retries included) is
+    timed and counted on its own and time spent waiting for the rate limiter
+    is never mistaken for a slow provider.
+    """
+
+    def __init__(self, model, breaker):
+        super().__init__(model)
+        self.breaker = breaker
+
+    def invoke(self, messages, **kwargs):
+        self.breaker.admit()
+        started_at = time.monotonic()
+        try:
+            response = super().invoke(messages, **kwargs)
+        except Exception as e:
+            self.breaker.record(time.monotonic() - started_at, e)
+            raise
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        self.breaker.record(time.monotonic() - started_at)
+        return response
+
+    async def ainvoke(self, messages, **kwargs):
+        self.breaker.admit()
+        started_at = time.monotonic()
+        try:
+            response = await super().ainvoke(messages, **kwargs)
+        except Exception as e:
+            self.breaker.record(time.monotonic() - started_at, e)
+            raise
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        self.breaker.record(time.monotonic() - started_at)
+        return response
+
+    def stats(self):
+        return self.breaker.stats()
@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import httpx
+from dotenv import load_dotenv
+from langchain.schema.messages import AIMessage
+from .Base import BaseLLM
+from src.Utils.PromptCompactor import count_tokens
+
+load_dotenv()
+
+# Local stand-in for the Groq model (LLM_PROVIDER=fake), for benchmarking the
+# agents without an API key or network access. Replies are canned JSON shaped
+# like what each agent's prompt asks for and depend only on the prompt, so
+# runs are repeatable; latency and errors come from a seeded generator.
+
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", 42))
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", 800))  # median
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", 0.5))  # log-normal spread; 0 = fixed latency
+FAKE_LLM_MS_PER_OUTPUT_TOKEN = float(os.getenv("FAKE_LLM_MS_PER_OUTPUT_TOKEN", 0))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", 0))
+FAKE_LLM_THROTTLE_SHARE = float(os.getenv("FAKE_LLM_THROTTLE_SHARE", 0.8))  # of errors, the share that are 429s
+FAKE_LLM_RETRY_AFTER_SEC = float(os.getenv("FAKE_LLM_RETRY_AFTER_SEC", 1))
+FAKE_LLM_MALFORMED_RATE = float(os.getenv("FAKE_LLM_MALFORMED_RATE", 0))  # JSON replies wrapped in code fences
+# JSON object of {"text found in the prompt": reply}; replies that are not strings are sent as JSON
+FAKE_LLM_RESPONSES_FILE = os.getenv("FAKE_LLM_RESPONSES_FILE")
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(\.[\w-]+)+")
+BATCH_CANDIDATE_PATTERN = re.compile(r"### Candidate (\S+)\n(.*?)(?=### Candidate |\Z)", re.DOTALL)
+
+
+class FakeLLMError(Exception):
+    """Looks like a Groq API error, so retries and backoff treat it the same way."""
+
+    def __init__(self, status_code, retry_after=None):
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.status_code = status_code
+        self.response = httpx.Response(status_code, headers=headers)
+        super().__init__(f"Fake LLM error {status_code}")
+
+
+def _score(text, low=0, high=100):
+    """Deterministic score for text."""
+    digest = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+    return low + digest % (high - low + 1)
+
+
+def _content(message):
+    return message if isinstance(message, str) else message.content
+
+
+def _intake_reply(system_prompt, human_prompt):
+    resume = human_prompt.split("\n\n", 1)[-1]
+    email = EMAIL_PATTERN.search(resume)
+    name = next((line.strip() for line in resume.splitlines() if line.strip()), "")
+    return {"name": name, "email": email.group(0) if email else None}
+
+
+def _shortlisting_reply(system_prompt, human_prompt):
+    candidates = BATCH_CANDIDATE_PATTERN.findall(human_prompt)
+    if not candidates:
+        score = _score(human_prompt, 30, 95)
+        return {"shortlisted": "yes" if score >= 75 else "no", "score": score}
+
+    replies = []
+    for candidate_id, resume in candidates:
+        score = _score(resume.strip(), 30, 95)
+        replies.append({"candidate_id": candidate_id, "shortlisted": "yes" if score >= 75 else "no", "score": score})
+    return replies
+
+
+def _interview_reply(system_prompt, human_prompt):
+    score = _score(human_prompt)
+    return {
+        "decision": "SELECT" if score >= 60 else "REJECT",
+        "feedback": f"Simulated evaluation (score {score}/100): clear communication with room to go deeper technically."
+    }
+
+
+def _chatbot_reply(system_prompt, human_prompt):
+    return "HireKruit automates hiring from resume collection to shortlisting, interviews and selection."
+
+
+# First marker found in the system prompt picks the reply
+CANNED_REPLIES = [
+    ("Resume Information Extraction Agent", _intake_reply),
+    ("Resume Screening Agent", _shortlisting_reply),
+    ("HR evaluator", _interview_reply),
+    ("Saarthi", _chatbot_reply)
+]
+
+
+def _load_responses(path):
+    if not path:
+        return {}
+    with open(path) as responses_file:
+        return json.load(responses_file)
+
+
+class FakeChatModel:
+    """Chat model with invoke/ainvoke like ChatGroq, answering from CANNED_REPLIES."""
+
+    temperature = 0
+
+    def __init__(
+        self,
+        model_name,
+        seed=FAKE_LLM_SEED,
+        latency_ms=FAKE_LLM_LATENCY_MS,
+        latency_sigma=FAKE_LLM_LATENCY_SIGMA,
+        error_rate=FAKE_LLM_ERROR_RATE,
+        malformed_rate=FAKE_LLM_MALFORMED_RATE,
+        responses=None
+    ):
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.responses = responses if responses is not None else _load_responses(FAKE_LLM_RESPONSES_FILE)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def _draw(self):
+        """Latency, error and malformed-reply draws for one call, from the seeded generator."""
+        with self._lock:
+            self.calls += 1
+            latency = self.latency_ms * self._random.lognormvariate(0, self.latency_sigma) if self.latency_sigma else self.latency_ms
+            failed = self._random.random() < self.error_rate
+            throttled = self._random.random() < FAKE_LLM_THROTTLE_SHARE
+            malformed = self._random.random() < self.malformed_rate
+            if failed:
+                self.errors += 1
+        error = None
+        if failed:
+            error = FakeLLMError(429, FAKE_LLM_RETRY_AFTER_SEC) if throttled else FakeLLMError(503)
+        return latency / 1000, error, malformed
+
+    def _reply(self, messages, malformed):
+        if isinstance(messages, str):
+            messages = [messages]
+        system_prompt = next((_content(message) for message in messages if getattr(message, "type", "") == "system"), "")
+        human_prompt = _content(messages[-1])
+        prompt = "\n".join(_content(message) for message in messages)
+
+        reply = next((response for marker, response in self.responses.items() if marker in prompt), None)
+        if reply is None:
+            handler = next((handler for marker, handler in CANNED_REPLIES if marker in system_prompt), None)
+            reply = handler(system_prompt, human_prompt) if handler else "OK"
+
+        if isinstance(reply, str):
+            content = reply
+        elif malformed:
+            # What the structured-output parser has to repair in real replies
+            content = "```json\n" + json.dumps(reply, indent=2) + "\n```"
+        else:
+            content = json.dumps(reply)
+
+        input_tokens = count_tokens(prompt)
+        output_tokens = count_tokens(content)
+        return AIMessage(
+            content=content,
+            response_metadata={"model_name": self.model_name, "finish_reason": "stop"},
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens
+            }
+        )
+
+    def invoke(self, messages, **kwargs):
+        latency, error, malformed = self._draw()
+        response = self._reply(messages, malformed)
+        time.sleep(latency + FAKE_LLM_MS_PER_OUTPUT_TOKEN * response.usage_metadata["output_tokens"] / 1000)
+        if error is not None:
+            raise error
+        return response
+
+    async def ainvoke(self, messages, **kwargs):
+        latency, error, malformed = self._draw()
+        response = self._reply(messages, malformed)
+        await asyncio.sleep(latency + FAKE_LLM_MS_PER_OUTPUT_TOKEN * response.usage_metadata["output_tokens"] / 1000)
+        if error is not None:
+            raise error
+        return response
+
+
+class FakeLLM(BaseLLM):
+    def __init__(self, model_name: str = "fake-llm", **options):
+        super().__init__(model_name)
+        self.options = options
+        self._model = None
+
+    def get_model(self):
+        if self._model is None:
+            self._model = FakeChatModel(self.model_name, **self.options)
+        return self._model
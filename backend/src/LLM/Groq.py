@@ -1,23 +1,88 @@
+import asyncio
 import os
+import threading
+import weakref
 from dotenv import load_dotenv
-from .Base import BaseLLM
+from .Base import BaseLLM, ModelWrapper
 from langchain_groq import ChatGroq  # Assuming langchain-groq is installed
 
 # Load environment variables from .env
 load_dotenv()
 
+
+class EventLoopModel(ModelWrapper):
+    """
+    Sync calls go to the shared ChatGroq. Async calls use a copy built per event
+    loop, because pooled httpx async connections cannot move between loops
+    (every asyncio.run() starts a new one). aclose_loop() closes the running
+    loop's client; run_sync (src/LLM/Base.py) calls it before its loop ends.
+    """
+
+    def __init__(self, model, build_async_model, async_client_factory):
+        super().__init__(model)
+        self._build_async_model = build_async_model
+        self._async_client_factory = async_client_factory
+        self._async_models = weakref.WeakKeyDictionary()  # loop -> (model, client)
+        self._lock = threading.Lock()
+
+    async def ainvoke(self, messages, **kwargs):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._async_models.get(loop)
+            if entry is None:
+                client = self._async_client_factory()
+                entry = self._async_models[loop] = (self._build_async_model(client), client)
+        return await entry[0].ainvoke(messages, **self._call_kwargs(kwargs))
+
+    async def aclose_loop(self):
+        """Close the async client of the running loop, which cannot be used once the loop is gone."""
+        with self._lock:
+            entry = self._async_models.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[1].aclose()
+
+
 class GroqLLM(BaseLLM):
-    def __init__(self, model_name: str = "llama-3.3-70b-versatile"): # llama3-70b-8192 ,  llama3-70b-4096 , llama-3.3-70b-versatile
+    def __init__(
+        self,
+        model_name: str = "llama-3.3-70b-versatile", # llama3-70b-8192 ,  llama3-70b-4096 , llama-3.3-70b-versatile
+        timeout: float = None,
+        max_retries: int = 2,
+        http_client=None,
+        http_async_client=None,
+        async_client_factory=None
+    ):
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
-            raise ValueError("GROQ_API_KEY not found in environment variables")
+            raise ValueError("GROQ_API_KEY not found in environment variables (set LLM_PROVIDER=fake to run without it)")
         
         super().__init__(model_name)
         self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        # Pooled httpx clients shared by every call made through this instance;
+        # async_client_factory, if given, makes one async client per event loop
+        self.http_client = http_client
+        self.http_async_client = http_async_client
+        self.async_client_factory = async_client_factory
+        self._model = None
 
-    def get_model(self):
+    def _build_model(self, http_async_client):
         return ChatGroq(
             api_key=self.api_key,
             model_name=self.model_name,
-            temperature=0
+            temperature=0,
+            request_timeout=self.timeout,
+            max_retries=self.max_retries,
+            http_client=self.http_client,
+            http_async_client=http_async_client
         )
+
+    def get_model(self):
+        # Built once so all callers reuse the same Groq client and its connection pool
+        if self._model is None:
+            model = self._build_model(self.http_async_client)
+            if self.async_client_factory is not None:
+                model = EventLoopModel(model, self._build_model, self.async_client_factory)
+            self._model = model
+        return self._model
@@ -0,0 +1,355 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+import httpx
+from dotenv import load_dotenv
+from groq import APIConnectionError
+from pymongo import ReturnDocument
+from .Base import ModelWrapper
+from src.Utils.PromptCompactor import count_tokens
+from src.Utils.TokenBucket import TokenBucket
+
+load_dotenv()
+
+LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "true").lower() == "true"
+
+# The Groq quota every call must stay under
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", 30))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", 0))  # 0 disables token-based limiting
+
+# Share the per-minute quota with other processes (Celery workers, API servers) through Mongo
+LLM_RATE_LIMIT_SHARED = os.getenv("LLM_RATE_LIMIT_SHARED", "false").lower() == "true"
+
+# Retries of 429s, 5xx and connection errors: full-jitter exponential backoff,
+# or the server's Retry-After when it sends one
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+LLM_BACKOFF_BASE_SEC = float(os.getenv("LLM_BACKOFF_BASE_SEC", 1))
+LLM_BACKOFF_MAX_SEC = float(os.getenv("LLM_BACKOFF_MAX_SEC", 60))
+
+# AIMD: in-flight calls grow by one per window of successes and halve on a 429
+LLM_AIMD_INITIAL_CONCURRENCY = int(os.getenv("LLM_AIMD_INITIAL_CONCURRENCY", 4))
+LLM_AIMD_MIN_CONCURRENCY = int(os.getenv("LLM_AIMD_MIN_CONCURRENCY", 1))
+LLM_AIMD_MAX_CONCURRENCY = int(os.getenv("LLM_AIMD_MAX_CONCURRENCY", 32))
+LLM_AIMD_DECREASE_FACTOR = float(os.getenv("LLM_AIMD_DECREASE_FACTOR", 0.5))
+# 429s from calls that were already in flight belong to the same overload; only the first one counts
+LLM_AIMD_DECREASE_COOLDOWN_SEC = float(os.getenv("LLM_AIMD_DECREASE_COOLDOWN_SEC", 2))
+
+RETRYABLE_STATUS_CODES = (408, 409, 429)
+
+
+def estimate_tokens(messages):
+    """Approximate prompt size in tokens."""
+    if isinstance(messages, str):
+        return count_tokens(messages)
+    return sum(count_tokens(message if isinstance(message, str) else message.content) for message in messages)
+
+
+def retry_after_seconds(error):
+    """Seconds from the Retry-After header of a failed call, or None."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    return isinstance(error, (APIConnectionError, httpx.TransportError, ConnectionError, TimeoutError))
+
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit for sync and async callers alike, adjusted by AIMD:
+    +1 per limit successes, times LLM_AIMD_DECREASE_FACTOR on throttling.
+    """
+
+    def __init__(
+        self,
+        initial=LLM_AIMD_INITIAL_CONCURRENCY,
+        minimum=LLM_AIMD_MIN_CONCURRENCY,
+        maximum=LLM_AIMD_MAX_CONCURRENCY
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.in_flight = 0
+        self.decreases = 0
+        self._decreased_at = 0.0
+        self._condition = threading.Condition()
+        self._async_waiters = deque()
+
+    def _try_acquire(self):
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self):
+        with self._condition:
+            while not self._try_acquire():
+                self._condition.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._try_acquire():
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._condition:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+                raise
+
+    def release(self, throttled=False):
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._decreased_at >= LLM_AIMD_DECREASE_COOLDOWN_SEC:
+                    self.limit = max(self.minimum, self.limit * LLM_AIMD_DECREASE_FACTOR)
+                    self._decreased_at = now
+                    self.decreases += 1
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+            # Wake everyone; whoever loses the race simply waits again
+            self._condition.notify_all()
+            waiters, self._async_waiters = self._async_waiters, deque()
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class SharedWindowLimiter:
+    """
+    Per-minute request and token counts kept in Mongo, so every process
+    draws from one quota. Fixed one-minute windows; a process that finds the
+    window full waits for the next one. Mongo errors never block a call.
+    """
+
+    def __init__(self, collection, requests_per_minute, tokens_per_minute, scope):
+        self.collection = collection
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.scope = scope
+        try:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            print("Failed to create llm_rate_limits indexes:", e)
+
+    def _reserve(self, tokens):
+        """Count the call in the current window; returns the seconds to wait when the window is full."""
+        window = int(time.time() // 60)
+        window_id = f"{self.scope}:{window}"
+        try:
+            counts = self.collection.find_one_and_update(
+                {"_id": window_id},
+                {
+                    "$inc": {"requests": 1, "tokens": tokens},
+                    "$setOnInsert": {"expires_at": datetime.utcnow() + timedelta(minutes=2)}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            # A request larger than the token quota may still go first in an empty window
+            over_requests = 0 < self.requests_per_minute < counts["requests"]
+            over_tokens = 0 < self.tokens_per_minute < counts["tokens"] and counts["tokens"] > tokens
+            if not (over_requests or over_tokens):
+                return 0
+            self.collection.update_one({"_id": window_id}, {"$inc": {"requests": -1, "tokens": -tokens}})
+        except Exception as e:
+            print("Shared rate limit unavailable, continuing locally:", e)
+            return 0
+        # Jitter so waiting processes do not all hit the next window at once
+        return (window + 1) * 60 - time.time() + random.uniform(0, 1)
+
+    def acquire(self, tokens):
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, tokens):
+        while True:
+            wait = await asyncio.to_thread(self._reserve, tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def consume(self, tokens):
+        """Add tokens used beyond the estimate to the current window."""
+        if tokens <= 0:
+            return
+        try:
+            self.collection.update_one(
+                {"_id": f"{self.scope}:{int(time.time() // 60)}"},
+                {"$inc": {"tokens": tokens}, "$setOnInsert": {"requests": 0, "expires_at": datetime.utcnow() + timedelta(minutes=2)}},
+                upsert=True
+            )
+        except Exception as e:
+            print("Shared rate limit unavailable, continuing locally:", e)
+
+
+class RateLimitedModel(ModelWrapper):
+    """
+    Keeps calls under the requests/tokens per minute quota and retries
+    throttled or failed calls with backoff. One instance per process, so every
+    agent and thread shares the same buckets, concurrency limit and pauses.
+    """
+
+    def __init__(
+        self,
+        model,
+        requests_per_minute=GROQ_REQUESTS_PER_MINUTE,
+        tokens_per_minute=GROQ_TOKENS_PER_MINUTE,
+        max_retries=LLM_MAX_RETRIES,
+        shared_limiter=None,
+        circuit_breaker=None
+    ):
+        super().__init__(model)
+        self.request_limiter = TokenBucket(requests_per_minute)
+        self.token_limiter = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency()
+        self.shared_limiter = shared_limiter
+        # Checked before waiting for the quota, so calls fail fast while the circuit is open
+        self.circuit_breaker = circuit_breaker
+        self.max_retries = max_retries
+        # A Retry-After holds back every caller, not only the one that got it
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def _backoff(self, error, attempt):
+        """Seconds to wait before retrying error, or None when it should not be retried."""
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = random.uniform(0, min(LLM_BACKOFF_MAX_SEC, LLM_BACKOFF_BASE_SEC * 2 ** attempt))
+        elif getattr(error, "status_code", None) == 429:
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return min(delay, LLM_BACKOFF_MAX_SEC)
+
+    def _on_error(self, error, attempt):
+        throttled = getattr(error, "status_code", None) == 429
+        self.concurrency.release(throttled=throttled)
+        delay = self._backoff(error, attempt)
+        if delay is not None and self.circuit_breaker is not None:
+            # This failure may have just opened the circuit; fail fast instead of retrying into it
+            try:
+                self.circuit_breaker.check()
+            except Exception:
+                self._count(failures=1)
+                raise
+        self._count(throttled=int(throttled), retries=int(delay is not None), failures=int(delay is None))
+        if delay is not None:
+            print(f"LLM call failed ({type(error).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    def _on_success(self, response, estimated_tokens):
+        self.concurrency.release()
+        self._count(requests=1)
+        # The estimate only covers the prompt; charge the rest once the real usage is known
+        usage = getattr(response, "usage_metadata", None) or {}
+        extra = usage.get("total_tokens", 0) - estimated_tokens
+        self.token_limiter.consume(extra)
+        if self.shared_limiter is not None:
+            self.shared_limiter.consume(extra)
+
+    def invoke(self, messages, **kwargs):
+        tokens = estimate_tokens(messages)
+        attempt = 0
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.check()
+            time.sleep(max(0.0, self._paused_until - time.monotonic()))
+            self.request_limiter.acquire()
+            self.token_limiter.acquire(tokens)
+            if self.shared_limiter is not None:
+                self.shared_limiter.acquire(tokens)
+            self.concurrency.acquire()
+            try:
+                response = self.model.invoke(messages, **self._call_kwargs(kwargs))
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._on_success(response, tokens)
+            return response
+
+    async def ainvoke(self, messages, **kwargs):
+        tokens = estimate_tokens(messages)
+        attempt = 0
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.check()
+            await asyncio.sleep(max(0.0, self._paused_until - time.monotonic()))
+            await self.request_limiter.aacquire()
+            await self.token_limiter.aacquire(tokens)
+            if self.shared_limiter is not None:
+                await self.shared_limiter.aacquire(tokens)
+            await self.concurrency.aacquire()
+            try:
+                response = await self.model.ainvoke(messages, **self._call_kwargs(kwargs))
+            except asyncio.CancelledError:
+                self.concurrency.release()
+                raise
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._on_success(response, tokens)
+            return response
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+            "concurrency_decreases": self.concurrency.decreases,
+            "shared": self.shared_limiter is not None
+        }
@@ -0,0 +1,191 @@
+import os
+import threading
+import httpx
+from dotenv import load_dotenv
+from .Base import BaseLLM
+from .Groq import GroqLLM
+from .Fake import FakeLLM
+from .Cache import CachedModel, LLM_CACHE_ENABLED, LLM_CACHE_PERSIST
+from .RateLimit import (
+    RateLimitedModel, SharedWindowLimiter, LLM_RATE_LIMIT_ENABLED, LLM_RATE_LIMIT_SHARED, LLM_MAX_RETRIES,
+    GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE
+)
+from .StructuredOutput import structured_output_stats
+from .CircuitBreaker import CircuitBreaker, CircuitBreakerModel, CircuitEventLog, LLM_BREAKER_ENABLED, LLM_BREAKER_PERSIST
+from .SingleFlight import SingleFlightModel, LLM_SINGLE_FLIGHT_ENABLED
+from .Usage import UsageRecorder, UsageTrackedModel, LLM_USAGE_ENABLED, LLM_USAGE_PERSIST
+
+load_dotenv()
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+LLM_TIMEOUT_SEC = float(os.getenv("LLM_TIMEOUT_SEC", 60))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 10))
+LLM_KEEPALIVE_EXPIRY_SEC = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SEC", 30))
+
+
+class LLMRegistry:
+    """
+    Process-wide LLM client shared by all agents.
+
+    The provider and its pooled keep-alive HTTP clients are built lazily on
+    first use and then reused; async calls get one pool per event loop.
+    Connection pools must not be shared between processes, so a forked child
+    (Celery prefork, gunicorn workers) discards whatever it inherited and
+    builds its own on first use.
+    """
+
+    def __init__(self, **settings):
+        self.settings = {
+            "provider": LLM_PROVIDER,
+            "model": LLM_MODEL,
+            "timeout": LLM_TIMEOUT_SEC,
+            "max_retries": LLM_MAX_RETRIES,
+            "max_connections": LLM_MAX_CONNECTIONS,
+            "max_keepalive_connections": LLM_MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry": LLM_KEEPALIVE_EXPIRY_SEC
+        }
+        self.settings.update(settings)
+        self._reset()
+
+    def _reset(self):
+        # Also used after fork: a lock held by another thread of the parent would never be released here
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+        self._llm = None
+        self._model = None
+        self._circuit_breaker = None
+        self._rate_limited = None
+        self._single_flight = None
+        self._cached = None
+        self._usage = None
+        self._http_client = None
+
+    def configure(self, **settings):
+        """Override settings (provider, model, timeout, max_connections, ...) before first use."""
+        with self._lock:
+            if self._llm is not None and self._pid == os.getpid():
+                raise RuntimeError("LLM registry is already in use; configure it before the first call")
+            self.settings.update(settings)
+
+    def _build(self):
+        settings = self.settings
+        limits = httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive_connections"],
+            keepalive_expiry=settings["keepalive_expiry"]
+        )
+        timeout = httpx.Timeout(settings["timeout"])
+        self._http_client = httpx.Client(limits=limits, timeout=timeout)
+
+        if settings["provider"] == "groq":
+            return GroqLLM(
+                settings["model"],
+                timeout=settings["timeout"],
+                # Retries happen in RateLimitedModel, where backoff is shared by all callers
+                max_retries=0 if LLM_RATE_LIMIT_ENABLED else settings["max_retries"],
+                http_client=self._http_client,
+                async_client_factory=lambda: httpx.AsyncClient(limits=limits, timeout=timeout)
+            )
+        if settings["provider"] == "fake":
+            # Own model name, so fake replies never share cache entries with real ones
+            return FakeLLM(f"fake-{settings['model']}")
+        raise ValueError(f"Unknown LLM provider: {settings['provider']}")
+
+    def get_llm(self) -> BaseLLM:
+        if self._pid != os.getpid():
+            self._reset()
+        with self._lock:
+            if self._llm is None:
+                self._llm = self._build()
+                print(f"LLM client ready: {self.settings['provider']} / {self.settings['model']} (pid {self._pid})")
+            return self._llm
+
+    def _wrap(self, model, model_name):
+        """Stack the shared wrappers around the provider's model."""
+        # Imported here so the Mongo connection is only set up by processes that call the LLM
+        from src.Utils.Database import db
+
+        if LLM_BREAKER_ENABLED:
+            self._circuit_breaker = CircuitBreaker(
+                f"{self.settings['provider']}:{model_name}",
+                event_log=CircuitEventLog(db.llm_circuit_events) if LLM_BREAKER_PERSIST else None
+            )
+            model = CircuitBreakerModel(model, self._circuit_breaker)
+        if LLM_RATE_LIMIT_ENABLED:
+            shared_limiter = None
+            if LLM_RATE_LIMIT_SHARED:
+                shared_limiter = SharedWindowLimiter(
+                    db.llm_rate_limits, GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE,
+                    scope=f"{self.settings['provider']}:{model_name}"
+                )
+            model = self._rate_limited = RateLimitedModel(
+                model, max_retries=self.settings["max_retries"], shared_limiter=shared_limiter,
+                circuit_breaker=self._circuit_breaker
+            )
+        if LLM_SINGLE_FLIGHT_ENABLED:
+            model = self._single_flight = SingleFlightModel(model, model_name)
+        if LLM_CACHE_ENABLED:
+            model = self._cached = CachedModel(
+                model, model_name, collection=db.llm_response_cache if LLM_CACHE_PERSIST else None
+            )
+        if LLM_USAGE_ENABLED:
+            # Outermost, so cache hits and the time spent waiting for the rate limiter are recorded too
+            recorder = UsageRecorder(db.llm_usage if LLM_USAGE_PERSIST else None)
+            model = self._usage = UsageTrackedModel(model, model_name, recorder)
+        return model
+
+    def get_model(self):
+        llm = self.get_llm()
+        with self._lock:
+            if self._model is None:
+                self._model = self._wrap(llm.get_model(), llm.model_name)
+            return self._model
+
+    def stats(self):
+        return {
+            "circuit_breaker": self._circuit_breaker.stats() if self._circuit_breaker is not None else None,
+            "cache": self._cached.stats() if self._cached is not None else None,
+            "rate_limit": self._rate_limited.stats() if self._rate_limited is not None else None,
+            "single_flight": self._single_flight.stats() if self._single_flight is not None else None,
+            "structured_output": structured_output_stats(),
+            "usage": self._usage.stats() if self._usage is not None else None
+        }
+
+    def flush(self):
+        """Write buffered usage records now, e.g. when a job finishes."""
+        usage = self._usage
+        if usage is not None and self._pid == os.getpid():
+            usage.recorder.flush()
+
+    def close(self):
+        with self._lock:
+            if self._usage is not None:
+                self._usage.recorder.close()
+            if self._http_client is not None:
+                self._http_client.close()
+            self._llm = None
+            self._model = None
+            self._circuit_breaker = None
+            self._rate_limited = None
+            self._single_flight = None
+            self._cached = None
+            self._usage = None
+            self._http_client = None
+
+
+registry = LLMRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry._reset)
+
+
+def get_llm():
+    """The process-wide BaseLLM provider."""
+    return registry.get_llm()
+
+
+def get_model():
+    """The process-wide chat model, ready for invoke()."""
+    return registry.get_model()
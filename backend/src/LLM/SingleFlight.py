@@ -0,0 +1,151 @@
+import asyncio
+import os
+import threading
+from dotenv import load_dotenv
+from .Base import ModelWrapper
+from .Cache import build_call_key
+
+load_dotenv()
+
+LLM_SINGLE_FLIGHT_ENABLED = os.getenv("LLM_SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+
+class Flight:
+    """One in-flight call that sync and async callers can wait on."""
+
+    def __init__(self):
+        self.response = None
+        self.error = None
+        self.abandoned = False
+        self.followers = 0
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._async_waiters = []
+
+    def finish(self, response=None, error=None, abandoned=False):
+        with self._lock:
+            self.response = response
+            self.error = error
+            self.abandoned = abandoned
+            self._done.set()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def wait(self):
+        self._done.wait()
+
+    async def await_done(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._done.is_set():
+                return
+            waiter = loop.create_future()
+            self._async_waiters.append((loop, waiter))
+        await waiter
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class SingleFlightModel(ModelWrapper):
+    """
+    Coalesces identical concurrent calls: the first caller with a given cache
+    key makes the request and everyone else arriving before it finishes gets
+    the same response (or error). Sits below the response cache, so it only
+    sees cache misses. Only deterministic calls are coalesced, and
+    bypass_cache calls always make their own request.
+    """
+
+    def __init__(self, model, model_name):
+        super().__init__(model)
+        self.model_name = model_name
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _key(self, messages, kwargs):
+        if kwargs.get("bypass_cache"):
+            return None
+        return build_call_key(self.model, self.model_name, messages, kwargs)
+
+    def _join(self, key):
+        """Returns (flight, leader); the leader must finish the flight."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            self.leaders += 1
+            return flight, True
+
+    def _land(self, key, flight, **result):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish(**result)
+
+    def _shared(self, flight):
+        if flight.error is not None:
+            raise flight.error
+        # Marked so usage accounting does not count the leader's tokens again
+        metadata = {**(getattr(flight.response, "response_metadata", None) or {}), "coalesced": True}
+        return flight.response.model_copy(update={"response_metadata": metadata})
+
+    def invoke(self, messages, **kwargs):
+        key = self._key(messages, kwargs)
+        if key is None:
+            return super().invoke(messages, **kwargs)
+
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                try:
+                    response = super().invoke(messages, **kwargs)
+                except Exception as e:
+                    self._land(key, flight, error=e)
+                    raise
+                except BaseException:
+                    self._land(key, flight, abandoned=True)
+                    raise
+                self._land(key, flight, response=response)
+                return response
+
+            flight.wait()
+            # The leader was interrupted without a result; try again, possibly as the new leader
+            if not flight.abandoned:
+                return self._shared(flight)
+
+    async def ainvoke(self, messages, **kwargs):
+        key = self._key(messages, kwargs)
+        if key is None:
+            return await super().ainvoke(messages, **kwargs)
+
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                try:
+                    response = await super().ainvoke(messages, **kwargs)
+                except Exception as e:
+                    self._land(key, flight, error=e)
+                    raise
+                except BaseException:
+                    # Cancelled: followers must not inherit the leader's cancellation
+                    self._land(key, flight, abandoned=True)
+                    raise
+                self._land(key, flight, response=response)
+                return response
+
+            await flight.await_done()
+            if not flight.abandoned:
+                return self._shared(flight)
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._flights)
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": in_flight}
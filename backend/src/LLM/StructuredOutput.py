@@ -0,0 +1,288 @@
+import ast
+import asyncio
+import json
+import os
+import re
+import threading
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from src.Prompts.PromptBuilder import PromptBuilder
+from .Cache import evict_cached_response
+from .CircuitBreaker import CircuitOpenError
+
+load_dotenv()
+
+# Turning an LLM reply into validated data without paying for the call twice:
+# strip code fences, extract the first JSON value, repair the usual mistakes
+# locally and validate against a pydantic schema. Only when all of that fails
+# is the model asked once to fix its own output. Replies that stay unusable
+# are dropped from the response cache, so the next attempt reaches the model.
+
+STRUCTURED_OUTPUT_REASK_ENABLED = os.getenv("STRUCTURED_OUTPUT_REASK_ENABLED", "true").lower() == "true"
+STRUCTURED_OUTPUT_REASK_MAX_CHARS = int(os.getenv("STRUCTURED_OUTPUT_REASK_MAX_CHARS", 6000))
+
+FENCE_PATTERN = re.compile(r"```[a-zA-Z]*\s*(.*?)\s*```", re.DOTALL)
+TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+UNQUOTED_KEY_PATTERN = re.compile(r"([{,]\s*)([A-Za-z_][\w-]*)(\s*:)")
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+REASK_SYSTEM_PROMPT = """
+    You fix malformed JSON produced by another model.
+    Return ONLY the corrected JSON, with the same content, matching the given JSON schema.
+    Do NOT add explanations, markdown or code blocks.
+    """
+
+_parsers = []
+_parsers_lock = threading.Lock()
+
+
+def strip_code_fences(text):
+    """Return the body of the first ``` fenced block, or the text itself when there is none."""
+    match = FENCE_PATTERN.search(text or "")
+    return match.group(1) if match else (text or "")
+
+
+def extract_json(text):
+    """
+    Return the first JSON object or array in text as a string. Brackets left
+    open by a truncated reply are closed; None when there is no JSON at all.
+    """
+    start = next((index for index, char in enumerate(text) if char in "{["), None)
+    if start is None:
+        return None
+
+    stack = []
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if not stack or stack[-1] != char:
+                break
+            stack.pop()
+            if not stack:
+                return text[start:index + 1]
+
+    # Truncated reply: close what is still open
+    return text[start:].rstrip().rstrip(",") + ('"' if in_string else "") + "".join(reversed(stack))
+
+
+def _replace_outside_strings(text, pattern, replacement):
+    """Apply a regex substitution to the parts of text that are not inside double-quoted strings."""
+    parts = re.split(r'("(?:\\.|[^"\\])*")', text)
+    return "".join(part if index % 2 else pattern.sub(replacement, part) for index, part in enumerate(parts))
+
+
+def repair_json(text):
+    """Fix smart quotes, trailing commas, unquoted keys and Python literals."""
+    text = text.translate(SMART_QUOTES)
+    text = _replace_outside_strings(text, TRAILING_COMMA_PATTERN, r"\1")
+    text = _replace_outside_strings(text, UNQUOTED_KEY_PATTERN, r'\1"\2"\3')
+    return _replace_outside_strings(
+        text, re.compile(r"\b(True|False|None)\b"), lambda match: PYTHON_LITERALS[match.group(1)]
+    )
+
+
+def load_json(text):
+    """
+    Decode an LLM reply. Returns (value, repaired) where repaired tells whether
+    anything beyond a plain json.loads was needed; raises ValueError on failure.
+    """
+    text = (text or "").strip()
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+
+    extracted = extract_json(strip_code_fences(text))
+    if extracted is None:
+        raise ValueError("no JSON object or array in reply")
+
+    for candidate in (extracted, repair_json(extracted)):
+        try:
+            return json.loads(candidate), True
+        except json.JSONDecodeError:
+            continue
+
+    # Single-quoted, Python-style dicts
+    try:
+        value = ast.literal_eval(extracted.translate(SMART_QUOTES))
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        raise ValueError("reply is not valid JSON and could not be repaired")
+    if not isinstance(value, (dict, list)):
+        raise ValueError("reply is not a JSON object or array")
+    return value, True
+
+
+def _describe(error):
+    """One-line summary of a pydantic ValidationError."""
+    return "; ".join(f"{'.'.join(map(str, item['loc'])) or 'reply'}: {item['msg']}" for item in error.errors())
+
+
+class StructuredOutputParser:
+    """
+    Parses replies into a pydantic schema and counts how often that needed a
+    local repair or a re-ask. Create one per agent at module level; every
+    parser is listed in structured_output_stats().
+    """
+
+    def __init__(self, name, reask_enabled=STRUCTURED_OUTPUT_REASK_ENABLED):
+        self.name = name
+        self.reask_enabled = reask_enabled
+        self.calls = 0
+        self.clean = 0
+        self.repaired = 0
+        self.reasked = 0
+        self.reask_recovered = 0
+        self.failed = 0
+        self.invalid_items = 0
+        self._lock = threading.Lock()
+        with _parsers_lock:
+            _parsers.append(self)
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def _validate(self, content, schema, many):
+        """Returns (result, repaired, error); result is None when the reply is unusable."""
+        try:
+            value, repaired = load_json(content)
+        except ValueError as e:
+            return None, True, str(e)
+
+        if not many:
+            try:
+                return schema.model_validate(value).model_dump(), repaired, None
+            except ValidationError as e:
+                return None, repaired, _describe(e)
+
+        # Arrays keep their valid items; the caller decides what to do with the rest
+        if isinstance(value, dict):
+            lists = [item for item in value.values() if isinstance(item, list)]
+            value = lists[0] if len(lists) == 1 else [value]
+        if not isinstance(value, list):
+            return None, repaired, "reply is not a JSON array"
+
+        items = []
+        for item in value:
+            try:
+                items.append(schema.model_validate(item).model_dump())
+            except ValidationError:
+                self._count(invalid_items=1)
+        if value and not items:
+            return None, repaired, "no item in the reply matches the schema"
+        return items, repaired, None
+
+    def _reask_messages(self, content, schema, many, error):
+        schema_json = json.dumps(schema.model_json_schema())
+        if many:
+            schema_json = f"an array of {schema_json}"
+        human_prompt = (
+            f"This reply could not be used: {error[:500]}\n\n"
+            f"JSON schema:\n{schema_json}\n\n"
+            f"Reply to fix:\n{(content or '')[:STRUCTURED_OUTPUT_REASK_MAX_CHARS]}"
+        )
+        return PromptBuilder.build(REASK_SYSTEM_PROMPT, human_prompt)
+
+    def _finish(self, result, repaired, reasked, error):
+        # Every call lands in exactly one of clean, repaired, reask_recovered or failed
+        if result is None:
+            print(f"[{self.name}] unusable structured output: {error}")
+            self._count(calls=1, failed=1)
+        elif reasked:
+            self._count(calls=1, reask_recovered=1)
+        elif repaired:
+            self._count(calls=1, repaired=1)
+        else:
+            self._count(calls=1, clean=1)
+        return result
+
+    def parse(self, reply, schema, reask=None, many=False):
+        """
+        Return the reply (a model response or its content) validated against schema
+        (a dict, or a list of dicts with many=True), or None. reask, a function
+        taking messages and returning the model's reply (e.g. model.invoke), is
+        called once as a last resort. Unusable replies are evicted from the cache.
+        """
+        content = getattr(reply, "content", reply)
+        result, repaired, error = self._validate(content, schema, many)
+        if result is None:
+            evict_cached_response(reply)
+        reasked = result is None and reask is not None and self.reask_enabled
+        if reasked:
+            self._count(reasked=1)
+            try:
+                response = reask(self._reask_messages(content, schema, many, error))
+                result, _, error = self._validate(response.content, schema, many)
+                if result is None:
+                    evict_cached_response(response)
+            except CircuitOpenError:
+                # Not a bad reply: the provider is down and the caller should defer the work
+                raise
+            except Exception as e:
+                error = str(e)
+        return self._finish(result, repaired, reasked, error)
+
+    async def aparse(self, reply, schema, reask=None, many=False):
+        """parse for async callers; reask is a coroutine function such as model.ainvoke."""
+        content = getattr(reply, "content", reply)
+        result, repaired, error = self._validate(content, schema, many)
+        if result is None:
+            # Eviction may hit Mongo
+            await asyncio.to_thread(evict_cached_response, reply)
+        reasked = result is None and reask is not None and self.reask_enabled
+        if reasked:
+            self._count(reasked=1)
+            try:
+                response = await reask(self._reask_messages(content, schema, many, error))
+                result, _, error = self._validate(response.content, schema, many)
+                if result is None:
+                    await asyncio.to_thread(evict_cached_response, response)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                error = str(e)
+        return self._finish(result, repaired, reasked, error)
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "clean": self.clean,
+            "repaired": self.repaired,
+            "reasked": self.reasked,
+            "reask_recovered": self.reask_recovered,
+            "failed": self.failed,
+            "invalid_items": self.invalid_items,
+            "repair_rate": round(self.repaired / self.calls, 3) if self.calls else 0.0,
+            "reask_rate": round(self.reasked / self.calls, 3) if self.calls else 0.0
+        }
+
+
+def structured_output_stats():
+    """Counters of every parser in this process, summed per parser name."""
+    totals = {}
+    with _parsers_lock:
+        parsers = list(_parsers)
+    for parser in parsers:
+        stats = parser.stats()
+        entry = totals.setdefault(parser.name, {key: 0 for key in stats if not key.endswith("_rate")})
+        for key in entry:
+            entry[key] += stats[key]
+    for entry in totals.values():
+        entry["repair_rate"] = round(entry["repaired"] / entry["calls"], 3) if entry["calls"] else 0.0
+        entry["reask_rate"] = round(entry["reasked"] / entry["calls"], 3) if entry["calls"] else 0.0
+    return totals
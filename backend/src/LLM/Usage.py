@@ -0,0 +1,182 @@
+import asyncio
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+from pymongo import ASCENDING
+from .Base import ModelWrapper
+
+load_dotenv()
+
+LLM_USAGE_ENABLED = os.getenv("LLM_USAGE_ENABLED", "true").lower() == "true"
+LLM_USAGE_PERSIST = os.getenv("LLM_USAGE_PERSIST", "true").lower() == "true"
+LLM_USAGE_TTL_SEC = int(os.getenv("LLM_USAGE_TTL_SEC", 90 * 24 * 3600))  # 90 days
+# Records are written in batches, once this many are buffered or the oldest is this old
+# (checked on every record and by a background thread, so an idle process still writes its tail)
+LLM_USAGE_FLUSH_SIZE = int(os.getenv("LLM_USAGE_FLUSH_SIZE", 50))
+LLM_USAGE_FLUSH_INTERVAL_SEC = float(os.getenv("LLM_USAGE_FLUSH_INTERVAL_SEC", 5))
+
+
+def token_usage(response):
+    """(prompt_tokens, completion_tokens) reported for a response; zeros when the provider sent none."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+class UsageRecorder:
+    """
+    Keeps running totals per (agent, model) and buffers one record per call
+    for the llm_usage collection.
+    """
+
+    def __init__(self, collection=None, flush_size=LLM_USAGE_FLUSH_SIZE, flush_interval=LLM_USAGE_FLUSH_INTERVAL_SEC):
+        self.collection = collection
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.totals = {}
+        self._buffer = []
+        self._buffered_at = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = None
+        if collection is not None:
+            try:
+                collection.create_index([("drive_id", ASCENDING), ("created_at", ASCENDING)])
+                collection.create_index([("created_at", ASCENDING)], expireAfterSeconds=LLM_USAGE_TTL_SEC)
+            except Exception as e:
+                print("Failed to create llm_usage indexes:", e)
+            atexit.register(self.flush)
+
+    def record(self, record):
+        """Count record in memory and buffer it; returns True when the buffer is due for a flush."""
+        with self._lock:
+            key = f"{record['agent'] or 'unknown'}:{record['model']}"
+            totals = self.totals.setdefault(key, {
+                "calls": 0, "errors": 0, "cache_hits": 0, "coalesced": 0,
+                "prompt_tokens": 0, "completion_tokens": 0,
+                "latency_ms_total": 0.0, "latency_ms_max": 0.0
+            })
+            totals["calls"] += 1
+            totals["errors"] += 1 if record["error"] else 0
+            totals["cache_hits"] += 1 if record["cache_hit"] else 0
+            totals["coalesced"] += 1 if record["coalesced"] else 0
+            totals["prompt_tokens"] += record["prompt_tokens"]
+            totals["completion_tokens"] += record["completion_tokens"]
+            totals["latency_ms_total"] += record["latency_ms"]
+            totals["latency_ms_max"] = max(totals["latency_ms_max"], record["latency_ms"])
+
+            if self.collection is None:
+                return False
+            self._buffer.append(record)
+            if self._buffered_at is None:
+                self._buffered_at = time.monotonic()
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, name="llm-usage-flush", daemon=True)
+                self._flusher.start()
+            return len(self._buffer) >= self.flush_size or time.monotonic() - self._buffered_at >= self.flush_interval
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            with self._lock:
+                due = self._buffered_at is not None and time.monotonic() - self._buffered_at >= self.flush_interval
+            if due:
+                self.flush()
+
+    def close(self):
+        """Stop the background flusher and write what is buffered."""
+        self._closed.set()
+        self.flush()
+
+    def flush(self):
+        """Write buffered records; usage is best effort, so failures are only logged."""
+        # A forked child inherits the parent's buffer (and this atexit hook); those records are not its to write
+        if os.getpid() != self._pid:
+            return
+        with self._flush_lock:
+            with self._lock:
+                records, self._buffer, self._buffered_at = self._buffer, [], None
+            if not records:
+                return
+            try:
+                self.collection.insert_many(records, ordered=False)
+            except Exception as e:
+                print(f"Failed to write {len(records)} llm_usage records:", e)
+
+    def stats(self):
+        with self._lock:
+            stats = {}
+            for key, totals in self.totals.items():
+                stats[key] = {
+                    **totals,
+                    "total_tokens": totals["prompt_tokens"] + totals["completion_tokens"],
+                    "latency_ms_avg": round(totals["latency_ms_total"] / totals["calls"], 1) if totals["calls"] else 0.0,
+                    "latency_ms_total": round(totals["latency_ms_total"], 1),
+                    "latency_ms_max": round(totals["latency_ms_max"], 1)
+                }
+            return stats
+
+
+class UsageTrackedModel(ModelWrapper):
+    """
+    Outermost wrapper: records tokens, latency, cache hits and errors of every
+    call. Callers tag calls with the agent and drive_id call options.
+    """
+
+    def __init__(self, model, model_name, recorder):
+        super().__init__(model)
+        self.model_name = model_name
+        self.recorder = recorder
+
+    def _record(self, kwargs, started_at, response=None, error=None):
+        metadata = getattr(response, "response_metadata", None) or {}
+        # Cache hits and coalesced calls did not send a request of their own
+        shared = bool(metadata.get("cache_hit") or metadata.get("coalesced"))
+        prompt_tokens, completion_tokens = token_usage(response) if response is not None and not shared else (0, 0)
+        return self.recorder.record({
+            "model": self.model_name,
+            "agent": kwargs.get("agent"),
+            "drive_id": kwargs.get("drive_id"),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "latency_ms": round((time.perf_counter() - started_at) * 1000, 1),
+            "cache_hit": bool(metadata.get("cache_hit")),
+            "coalesced": bool(metadata.get("coalesced")),
+            "error": type(error).__name__ if error is not None else None,
+            "created_at": datetime.utcnow()
+        })
+
+    def invoke(self, messages, **kwargs):
+        started_at = time.perf_counter()
+        try:
+            response = self.model.invoke(messages, **self._call_kwargs(kwargs))
+        except Exception as e:
+            if self._record(kwargs, started_at, error=e):
+                self.recorder.flush()
+            raise
+        if self._record(kwargs, started_at, response=response):
+            self.recorder.flush()
+        return response
+
+    async def ainvoke(self, messages, **kwargs):
+        started_at = time.perf_counter()
+        try:
+            response = await self.model.ainvoke(messages, **self._call_kwargs(kwargs))
+        except Exception as e:
+            if self._record(kwargs, started_at, error=e):
+                await asyncio.to_thread(self.recorder.flush)
+            raise
+        if self._record(kwargs, started_at, response=response):
+            # Blocking Mongo write, kept off the event loop
+            await asyncio.to_thread(self.recorder.flush)
+        return response
+
+    def stats(self):
+        return self.recorder.stats()
@@ -0,0 +1,68 @@
+from datetime import datetime
+from enum import Enum
+
+class IngestionStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    RETRYING = "retrying"
+    DEFERRED = "deferred"  # waiting for the LLM provider to recover
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+def create_ingestion_job(drive_id, resume_urls, job_role=None, skills=None):
+    """
+    Create a resume ingestion job document.
+    processed counts stored resumes (deduplicated ones included),
+    deduplicated counts resume cache hits and failed counts resumes that
+    could not be ingested; failures keeps the reason per resume.
+    settled_urls lists the resumes already counted; counters carry over
+    between attempts and a retried or deferred job only processes the rest.
+    """
+    if not drive_id:
+        raise ValueError("drive_id is required")
+
+    if not resume_urls:
+        raise ValueError("At least one resume is required")
+
+    return {
+        "drive_id": drive_id,
+        "job_role": job_role,
+        "skills": skills,
+        "resume_urls": resume_urls,
+        "status": IngestionStatus.QUEUED,
+        "total": len(resume_urls),
+        "processed": 0,
+        "deduplicated": 0,
+        "failed": 0,
+        "failures": [],  # [{"resume_url": ..., "stage": "download", "error": "..."}]
+        "settled_urls": [],
+        "stage_stats": [],
+        "deferrals": 0,
+        "task_id": None,
+        "error": None,
+        "started_at": None,
+        "completed_at": None,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+
+
+def format_ingestion_job(job):
+    """Convert an ingestion job document into a JSON-friendly progress summary."""
+    return {
+        "job_id": str(job["_id"]),
+        "drive_id": job.get("drive_id"),
+        "status": job.get("status"),
+        "total": job.get("total", 0),
+        "processed": job.get("processed", 0),
+        "deduplicated": job.get("deduplicated", 0),
+        "failed": job.get("failed", 0),
+        "failures": job.get("failures", []),
+        "stage_stats": job.get("stage_stats", []),
+        "deferrals": job.get("deferrals", 0),
+        "error": job.get("error"),
+        "started_at": job["started_at"].isoformat() if job.get("started_at") else None,
+        "completed_at": job["completed_at"].isoformat() if job.get("completed_at") else None,
+        "created_at": job["created_at"].isoformat() if job.get("created_at") else None
+    }
@@ -0,0 +1,67 @@
+from datetime import datetime
+from enum import Enum
+
+class ShortlistingStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    RETRYING = "retrying"
+    DEFERRED = "deferred"  # waiting for the LLM provider to recover
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+def create_shortlisting_job(drive_id, total, force_rescore=False):
+    """
+    Create a shortlisting job document.
+    processed counts every candidate once at its checkpoint; of those,
+    shortlisted and not_shortlisted were scored by this job and skipped kept
+    a still valid stored score (incremental mode). llm_calls_saved counts the
+    candidates the lexical pre-filter rejected. Counters carry over between
+    attempts, so a resumed job continues from where the previous one stopped.
+    """
+    if not drive_id:
+        raise ValueError("drive_id is required")
+
+    return {
+        "drive_id": drive_id,
+        "force_rescore": force_rescore,
+        "status": ShortlistingStatus.QUEUED,
+        "total": total,
+        "processed": 0,
+        "shortlisted": 0,
+        "not_shortlisted": 0,
+        "skipped": 0,
+        "llm_calls_saved": 0,
+        "attempts": 0,
+        "deferrals": 0,
+        "task_id": None,
+        "error": None,
+        "last_checkpoint_at": None,
+        "started_at": None,
+        "completed_at": None,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+
+
+def format_shortlisting_job(job):
+    """Convert a shortlisting job document into a JSON-friendly progress summary."""
+    return {
+        "job_id": str(job["_id"]),
+        "drive_id": job.get("drive_id"),
+        "status": job.get("status"),
+        "force_rescore": job.get("force_rescore", False),
+        "total": job.get("total", 0),
+        "processed": job.get("processed", 0),
+        "shortlisted": job.get("shortlisted", 0),
+        "not_shortlisted": job.get("not_shortlisted", 0),
+        "skipped": job.get("skipped", 0),
+        "llm_calls_saved": job.get("llm_calls_saved", 0),
+        "attempts": job.get("attempts", 0),
+        "deferrals": job.get("deferrals", 0),
+        "error": job.get("error"),
+        "last_checkpoint_at": job["last_checkpoint_at"].isoformat() if job.get("last_checkpoint_at") else None,
+        "started_at": job["started_at"].isoformat() if job.get("started_at") else None,
+        "completed_at": job["completed_at"].isoformat() if job.get("completed_at") else None,
+        "created_at": job["created_at"].isoformat() if job.get("created_at") else None
+    }
@@ -26,11 +26,11 @@ def create_driveCandidate(file_paths, keywords, job_role, drive_id):
     return candidates
 
 # Shortlisting agent shortlists candidates based on keywords and job role
-def shortlist_candidates(candidates, keywords, job_role):
+def shortlist_candidates(candidates, keywords, job_role, force_rescore=False):
     print("Starting shortlisting process")
     shortlisting_agent = ResumeShortlistingAgent()
-    shortlist_result  = shortlisting_agent.shortlist_candidates(candidates, keywords, job_role)
-    # return shortlist_result
+    shortlist_result  = shortlisting_agent.shortlist_candidates(candidates, keywords, job_role, force_rescore)
+    return shortlist_result
 
 # EmailingAgent sends emails to shortlisted and not-shortlisted candidates
 def email_candidates(drive_id):
@@ -51,6 +51,7 @@ def get_drive_status(driveId):
         return jsonify({
             "message": "Drive status retrieved successfully",
             "status": drive_data["drive"]["status"],
+            "shortlisting": drive_data["drive"].get("shortlisting"),
             "drive_id": driveId
         }), 200
     else:
@@ -0,0 +1,14 @@
+from flask import Blueprint
+from src.Controllers.llm_controller import get_drive_llm_usage, get_llm_stats
+
+llm_bp = Blueprint("llm_bp", __name__)
+
+# Token, latency and cache usage of a drive's LLM calls
+@llm_bp.route("/usage/drive/<drive_id>", methods=["GET"])
+def handle_drive_llm_usage(drive_id):
+    return get_drive_llm_usage(drive_id)
+
+# Counters of the LLM client in this server process and every process's circuit breaker state
+@llm_bp.route("/stats", methods=["GET"])
+def handle_llm_stats():
+    return get_llm_stats()
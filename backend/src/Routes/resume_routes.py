@@ -1,5 +1,5 @@
 from flask import Blueprint
-from src.Controllers.resume_controllers import upload_resumes
+from src.Controllers.resume_controllers import upload_resumes, get_ingestion_status
 from src.Controllers.allresumes_controller import get_all_drives_candidates_controller , get_drive_candidates_controller
 
 resume_bp = Blueprint('resume', __name__)
@@ -10,6 +10,11 @@ def handle_upload_resumes():
     print("Upload resumes endpoint hit")
     return upload_resumes()
 
+# Progress of a queued resume ingestion job
+@resume_bp.route('/ingestion/<job_id>', methods=['GET'])
+def handle_ingestion_status(job_id):
+    return get_ingestion_status(job_id)
+
 
 # In your routes file
 @resume_bp.route('/<drive_id>/candidates', methods=['GET'])
@@ -0,0 +1,20 @@
+from flask_socketio import SocketIO
+from src.SocketIO.SocketIO_Instance import SOCKETIO_MESSAGE_QUEUE
+
+# Write-only SocketIO client for processes without the Flask app (Celery workers).
+# Events go through the message queue to the web server, which forwards them to clients.
+_emitter = None
+
+
+def emit_progress(event, data):
+    global _emitter
+    if not SOCKETIO_MESSAGE_QUEUE:
+        return
+
+    try:
+        if _emitter is None:
+            _emitter = SocketIO(message_queue=SOCKETIO_MESSAGE_QUEUE)
+        _emitter.emit(event, data)
+    except Exception as e:
+        # Progress events are best effort; the job status endpoint stays authoritative
+        print(f"Failed to emit {event}: {e}")
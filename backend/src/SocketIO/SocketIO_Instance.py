@@ -1,4 +1,11 @@
+import os
+from dotenv import load_dotenv
 from flask_socketio import SocketIO
 
+load_dotenv()
+
+# Shared message queue lets Celery workers emit events to connected clients
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+
 # Create SocketIO instance (don't bind app here)
-socketio = SocketIO(cors_allowed_origins="*")
+socketio = SocketIO(cors_allowed_origins="*", message_queue=SOCKETIO_MESSAGE_QUEUE)
@@ -1,8 +1,21 @@
 # src/Tasks/tasks.py
 from celery_app import celery
 import os
+import random
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
 from src.Agents.EmailingAgent import EmailingAgent
 from src.Agents.InterviewSchedulingAgent import InterviewSchedulingAgent
+from src.Agents.ResumeIntakeAgent import ResumeIntakeAgent
+from src.Agents.ResumeShortlistingAgent import ResumeShortlistingAgent
+from src.LLM.CircuitBreaker import CircuitOpenError
+from src.LLM.Registry import registry as llm_registry
+from src.Model.IngestionJob import IngestionStatus
+from src.Model.ShortlistingJob import ShortlistingStatus
+from src.Model.DriveCandidate import initialize_candidate_rounds
+from src.SocketIO.ProgressEmitter import emit_progress
+from src.Utils.Database import db
 from src.Utils.EmailService import EmailService
 # from src.Utils.GoogleEmailService import EmailService 
 from dotenv import load_dotenv
@@ -13,6 +26,44 @@ SMTP_SERVER = os.getenv("SMTP_SERVER")
 SMTP_PORT = int(os.getenv("SMTP_PORT"))
 EMAIL_USER = os.getenv("EMAIL_USER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+# LLM jobs that find the provider's circuit open are requeued this many times
+# before failing; deferrals do not use up the task's retries
+LLM_JOB_MAX_DEFERRALS = int(os.getenv("LLM_JOB_MAX_DEFERRALS", 20))
+LLM_JOB_DEFER_JITTER_SEC = float(os.getenv("LLM_JOB_DEFER_JITTER_SEC", 10))
+
+
+def defer_llm_job(task, collection, job_id, error, deferred_status, failed_status, event):
+    """
+    Requeue a job until the LLM circuit closes again. Jitter spreads the
+    requeued jobs so they do not all arrive with the first trial call.
+    Returns False, with the job marked failed, once it was deferred too often.
+    """
+    job_object_id = ObjectId(job_id)
+    job = collection.find_one_and_update(
+        {"_id": job_object_id},
+        {"$inc": {"deferrals": 1}, "$set": {"error": str(error), "updated_at": datetime.utcnow()}},
+        projection={"drive_id": 1, "deferrals": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if job["deferrals"] > LLM_JOB_MAX_DEFERRALS:
+        print(f"Job {job_id} deferred {job['deferrals'] - 1} times, giving up")
+        collection.update_one({"_id": job_object_id}, {"$set": {"status": failed_status}})
+        return False
+
+    countdown = error.retry_after + random.uniform(0, LLM_JOB_DEFER_JITTER_SEC)
+    task_result = task.apply_async(args=[job_id], countdown=countdown)
+    collection.update_one(
+        {"_id": job_object_id},
+        {"$set": {"status": deferred_status, "task_id": task_result.id}}
+    )
+    print(f"Job {job_id} deferred for {countdown:.0f}s: {error}")
+    emit_progress(event, {
+        "job_id": job_id,
+        "drive_id": job["drive_id"],
+        "retry_in": round(countdown)
+    })
+    return True
+
 
 # Simplified task names - remove the "src.Tasks.tasks" prefix
 @celery.task(name="email_candidates_task", bind=True)
@@ -89,3 +140,247 @@ def schedule_coding_assessments_task(self, drive_id):
     except Exception as e:
         print(f"Error in schedule_coding_assessments_task: {str(e)}")
         raise self.retry(exc=e, countdown=60, max_retries=3)
+
+
+@celery.task(name="ingest_resumes_task", bind=True)
+def ingest_resumes_task(self, job_id):
+    """Run resume intake for an ingestion job and record progress per resume"""
+    job_object_id = ObjectId(job_id)
+    try:
+        job = db.ingestion_jobs.find_one({"_id": job_object_id})
+        if not job:
+            raise ValueError(f"Ingestion job {job_id} not found")
+
+        # Counters carry over between attempts; resumes an earlier attempt settled are not
+        # processed again (they would come back as cache hits and count as deduplicated)
+        settled_urls = set(job.get("settled_urls", []))
+        pending_urls = [url for url in job["resume_urls"] if url not in settled_urls]
+        print(f"Starting resume ingestion job {job_id} for drive {job['drive_id']} ({len(pending_urls)} of {job['total']} resumes to process)")
+
+        db.ingestion_jobs.update_one(
+            {"_id": job_object_id},
+            {"$set": {
+                "status": IngestionStatus.RUNNING,
+                "task_id": self.request.id,
+                "error": None,
+                "started_at": job.get("started_at") or datetime.utcnow(),
+                "updated_at": datetime.utcnow()
+            }}
+        )
+
+        def on_progress(update):
+            increments = {"processed": 1} if update["status"] == "processed" else {"failed": 1}
+            if update["cache_hit"]:
+                increments["deduplicated"] = 1
+
+            change = {
+                "$inc": increments,
+                "$addToSet": {"settled_urls": update["resume_url"]},
+                "$set": {"updated_at": datetime.utcnow()}
+            }
+            if update["status"] == "failed":
+                change["$push"] = {"failures": {
+                    "resume_url": update["resume_url"],
+                    "stage": update["stage"],
+                    "error": update["error"]
+                }}
+
+            progress = db.ingestion_jobs.find_one_and_update(
+                {"_id": job_object_id},
+                change,
+                projection={"total": 1, "processed": 1, "deduplicated": 1, "failed": 1},
+                return_document=ReturnDocument.AFTER
+            )
+            emit_progress("ingestion_progress", {
+                "job_id": job_id,
+                "drive_id": job["drive_id"],
+                "resume_url": update["resume_url"],
+                "resume_status": update["status"],
+                "total": progress["total"],
+                "processed": progress["processed"],
+                "deduplicated": progress["deduplicated"],
+                "failed": progress["failed"]
+            })
+
+        intake_agent = ResumeIntakeAgent()
+        intake_agent.process_resumes(pending_urls, job["drive_id"], on_progress=on_progress)
+
+        counts = db.ingestion_jobs.find_one_and_update(
+            {"_id": job_object_id},
+            {"$set": {
+                "status": IngestionStatus.COMPLETED,
+                "stage_stats": intake_agent.stage_stats,
+                "completed_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow()
+            }},
+            projection={"processed": 1, "deduplicated": 1, "failed": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        emit_progress("ingestion_completed", {
+            "job_id": job_id,
+            "drive_id": job["drive_id"],
+            "processed": counts["processed"],
+            "deduplicated": counts["deduplicated"],
+            "failed": counts["failed"]
+        })
+
+        print(f"Resume ingestion job {job_id} completed")
+        return {
+            "status": "success",
+            "job_id": job_id,
+            "processed": counts["processed"],
+            "failed": counts["failed"]
+        }
+
+    except CircuitOpenError as e:
+        if defer_llm_job(self, db.ingestion_jobs, job_id, e, IngestionStatus.DEFERRED, IngestionStatus.FAILED, "ingestion_deferred"):
+            return {"status": "deferred", "job_id": job_id}
+        raise
+
+    except Exception as e:
+        print(f"Error in ingest_resumes_task: {str(e)}")
+        final_attempt = self.request.retries >= 3
+        db.ingestion_jobs.update_one(
+            {"_id": job_object_id},
+            {"$set": {
+                "status": IngestionStatus.FAILED if final_attempt else IngestionStatus.RETRYING,
+                "error": str(e),
+                "updated_at": datetime.utcnow()
+            }}
+        )
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+    finally:
+        # The worker lives on after the job; its LLM usage should not wait in the buffer
+        llm_registry.flush()
+
+
+# acks_late + reject_on_worker_lost: if the worker dies mid-run the message goes back
+# to the queue and the next attempt resumes from the job's last checkpoint
+@celery.task(name="shortlist_candidates_task", bind=True, acks_late=True, reject_on_worker_lost=True)
+def shortlist_candidates_task(self, job_id):
+    """Shortlist a drive's candidates, checkpointing after each candidate or batch"""
+    job_object_id = ObjectId(job_id)
+    try:
+        job = db.shortlisting_jobs.find_one({"_id": job_object_id})
+        if not job:
+            raise ValueError(f"Shortlisting job {job_id} not found")
+        if job["status"] == ShortlistingStatus.COMPLETED:
+            print(f"Shortlisting job {job_id} already completed")
+            return {"status": "success", "job_id": job_id}
+
+        drive_id = job["drive_id"]
+        drive = db.drives.find_one({"_id": ObjectId(drive_id)})
+        if not drive:
+            raise ValueError(f"Drive {drive_id} not found")
+
+        candidates = list(db.drive_candidates.find({"drive_id": drive_id}))
+        print(f"Starting shortlisting job {job_id} for drive {drive_id} ({len(candidates)} candidates, attempt {job.get('attempts', 0) + 1})")
+
+        # Counters are kept across attempts; the agent skips what earlier attempts checkpointed
+        db.shortlisting_jobs.update_one(
+            {"_id": job_object_id},
+            {
+                "$set": {
+                    "status": ShortlistingStatus.RUNNING,
+                    "task_id": self.request.id,
+                    "total": len(candidates),
+                    "error": None,
+                    "started_at": job.get("started_at") or datetime.utcnow(),
+                    "updated_at": datetime.utcnow()
+                },
+                "$inc": {"attempts": 1}
+            }
+        )
+
+        def on_checkpoint(updates):
+            increments = {"processed": len(updates)}
+            for update in updates:
+                counter = "llm_calls_saved" if update["status"] == "prefilter_rejected" else update["status"]
+                increments[counter] = increments.get(counter, 0) + 1
+
+            progress = db.shortlisting_jobs.find_one_and_update(
+                {"_id": job_object_id},
+                {"$inc": increments, "$set": {"last_checkpoint_at": datetime.utcnow(), "updated_at": datetime.utcnow()}},
+                projection={
+                    "total": 1, "processed": 1, "shortlisted": 1, "not_shortlisted": 1, "skipped": 1, "llm_calls_saved": 1
+                },
+                return_document=ReturnDocument.AFTER
+            )
+            emit_progress("shortlisting_progress", {
+                "job_id": job_id,
+                "drive_id": drive_id,
+                "total": progress["total"],
+                "processed": progress["processed"],
+                "shortlisted": progress["shortlisted"],
+                "not_shortlisted": progress["not_shortlisted"],
+                "skipped": progress["skipped"],
+                "llm_calls_saved": progress.get("llm_calls_saved", 0)
+            })
+
+        shortlisting_agent = ResumeShortlistingAgent()
+        shortlist_result = shortlisting_agent.shortlist_candidates(
+            candidates,
+            drive.get("skills", []),
+            drive.get("role", ""),
+            force_rescore=job.get("force_rescore", False),
+            job_id=job_id,
+            on_checkpoint=on_checkpoint
+        )
+
+        # Initialize rounds for shortlisted candidates; without force_rescore
+        # candidates that already have rounds keep their progress
+        shortlisted_filter = {"drive_id": drive_id, "resume_shortlisted": "yes"}
+        if not job.get("force_rescore", False):
+            shortlisted_filter["rounds_status.0"] = {"$exists": False}
+        rounds_status = initialize_candidate_rounds(drive.get("rounds", []))
+        db.drive_candidates.update_many(shortlisted_filter, {"$set": {"rounds_status": rounds_status}})
+        print(f"Initialized round statuses for shortlisted candidates")
+
+        db.shortlisting_jobs.update_one(
+            {"_id": job_object_id},
+            {"$set": {
+                "status": ShortlistingStatus.COMPLETED,
+                "completed_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow()
+            }}
+        )
+        emit_progress("shortlisting_completed", {
+            "job_id": job_id,
+            "drive_id": drive_id,
+            "shortlisted": len(shortlist_result["shortlisted"]),
+            "not_shortlisted": len(shortlist_result["not_shortlisted"]),
+            "skipped": shortlist_result["skipped"],
+            "llm_calls_saved": shortlist_result["llm_calls_saved"]
+        })
+
+        print(f"Shortlisting job {job_id} completed")
+        return {
+            "status": "success",
+            "job_id": job_id,
+            "shortlisted": len(shortlist_result["shortlisted"]),
+            "not_shortlisted": len(shortlist_result["not_shortlisted"]),
+            "llm_calls_saved": shortlist_result["llm_calls_saved"]
+        }
+
+    except CircuitOpenError as e:
+        if defer_llm_job(self, db.shortlisting_jobs, job_id, e, ShortlistingStatus.DEFERRED, ShortlistingStatus.FAILED, "shortlisting_deferred"):
+            return {"status": "deferred", "job_id": job_id}
+        raise
+
+    except Exception as e:
+        print(f"Error in shortlist_candidates_task: {str(e)}")
+        final_attempt = self.request.retries >= 3
+        db.shortlisting_jobs.update_one(
+            {"_id": job_object_id},
+            {"$set": {
+                "status": ShortlistingStatus.FAILED if final_attempt else ShortlistingStatus.RETRYING,
+                "error": str(e),
+                "updated_at": datetime.utcnow()
+            }}
+        )
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+    finally:
+        # The worker lives on after the job; its LLM usage should not wait in the buffer
+        llm_registry.flush()
@@ -0,0 +1,129 @@
+import asyncio
+import os
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from dotenv import load_dotenv
+from src.Utils.Database import db
+from src.Model.DriveCandidate import create_drive_candidate
+
+load_dotenv()
+
+INTAKE_PERSIST_BATCH_SIZE = int(os.getenv("INTAKE_PERSIST_BATCH_SIZE", 50))
+INTAKE_PERSIST_LINGER_SEC = float(os.getenv("INTAKE_PERSIST_LINGER_SEC", 0.2))
+
+
+class CandidateBatchWriter:
+    """
+    Group-commit writer for the intake persist stage.
+
+    Callers await write() for one candidate; candidates are buffered and
+    flushed together once batch_size are waiting (or after linger_seconds
+    for the tail of a run). A flush costs three round-trips for the whole
+    batch: a bulk upsert into candidates, one $in query for the ids and a
+    bulk upsert into drive_candidates.
+    """
+
+    def __init__(self, drive_id, batch_size=INTAKE_PERSIST_BATCH_SIZE, linger_seconds=INTAKE_PERSIST_LINGER_SEC):
+        self.drive_id = drive_id
+        self.batch_size = max(1, batch_size)
+        self.linger_seconds = linger_seconds
+        self.flushes = 0
+        self._pending = []
+        self._timer = None
+
+    async def write(self, candidate_data):
+        """Persist one candidate; returns it with candidate_id set once its batch is flushed."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((candidate_data, future))
+
+        if len(self._pending) >= self.batch_size:
+            self._flush_pending()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.linger_seconds, self._flush_pending)
+
+        return await future
+
+    def _flush_pending(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._flush(batch))
+
+    async def _flush(self, batch):
+        try:
+            errors = await asyncio.to_thread(self._write_batch, [candidate for candidate, _ in batch])
+        except Exception as e:
+            errors = {index: e for index in range(len(batch))}
+
+        for index, (candidate, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in errors:
+                future.set_exception(errors[index])
+            else:
+                future.set_result(candidate)
+
+    def _write_batch(self, candidates):
+        """Write one batch; returns {index: exception} for the candidates that failed."""
+        self.flushes += 1
+        errors = {}
+        now = datetime.utcnow()
+
+        candidate_ops = []
+        for candidate in candidates:
+            fields = {key: value for key, value in candidate.items() if key != "created_at"}
+            candidate_ops.append(UpdateOne(
+                {"email": candidate["email"]},
+                # created_at is only set on first insert, keeping the candidate's history
+                {"$set": fields, "$setOnInsert": {"created_at": now}},
+                upsert=True
+            ))
+
+        try:
+            db.candidates.bulk_write(candidate_ops, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                errors[write_error["index"]] = Exception(write_error.get("errmsg", "Bulk write failed"))
+
+        # Fetch stored candidate IDs for the whole batch at once
+        emails = [candidate["email"] for index, candidate in enumerate(candidates) if index not in errors]
+        stored = {
+            doc["email"]: doc
+            for doc in db.candidates.find({"email": {"$in": emails}}, {"_id": 1, "email": 1, "created_at": 1})
+        }
+
+        drive_ops = []
+        drive_indexes = []
+        for index, candidate in enumerate(candidates):
+            if index in errors:
+                continue
+            doc = stored.get(candidate["email"])
+            if not doc:
+                errors[index] = Exception(f"Candidate not found after upsert: {candidate['email']}")
+                continue
+
+            candidate["candidate_id"] = str(doc["_id"])
+            candidate["created_at"] = doc.get("created_at", now)
+
+            # Create drive-candidate entry
+            drive_entry = create_drive_candidate(candidate_id=candidate["candidate_id"], drive_id=self.drive_id)
+            drive_ops.append(UpdateOne(
+                {"candidate_id": candidate["candidate_id"], "drive_id": self.drive_id},
+                {"$set": drive_entry},
+                upsert=True
+            ))
+            drive_indexes.append(index)
+
+        if drive_ops:
+            try:
+                db.drive_candidates.bulk_write(drive_ops, ordered=False)
+            except BulkWriteError as e:
+                for write_error in e.details.get("writeErrors", []):
+                    errors[drive_indexes[write_error["index"]]] = Exception(write_error.get("errmsg", "Bulk write failed"))
+
+        print(f"Persisted batch of {len(candidates) - len(errors)} candidates ({len(errors)} failed)")
+        return errors
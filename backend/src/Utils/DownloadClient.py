@@ -0,0 +1,115 @@
+import io
+import os
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DOWNLOAD_CONNECT_TIMEOUT_SEC = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT_SEC", 5))
+DOWNLOAD_READ_TIMEOUT_SEC = float(os.getenv("DOWNLOAD_READ_TIMEOUT_SEC", 20))
+DOWNLOAD_TOTAL_TIMEOUT_SEC = float(os.getenv("DOWNLOAD_TOTAL_TIMEOUT_SEC", 60))
+DOWNLOAD_MAX_RETRIES = int(os.getenv("DOWNLOAD_MAX_RETRIES", 3))
+DOWNLOAD_BACKOFF_FACTOR = float(os.getenv("DOWNLOAD_BACKOFF_FACTOR", 0.5))
+DOWNLOAD_POOL_SIZE = int(os.getenv("DOWNLOAD_POOL_SIZE", 16))
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", 10 * 1024 * 1024))  # 10 MB
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+
+class DownloadError(Exception):
+    pass
+
+
+class DownloadTooLarge(DownloadError):
+    pass
+
+
+class DownloadClient:
+    """
+    Shared HTTP client for fetching resume files.
+
+    Keeps one keep-alive connection pool per process, retries transient
+    failures with exponential backoff, bounds connect/read/total time and
+    streams the body in chunks so an oversized file is rejected before it
+    is fully read into memory.
+    """
+
+    def __init__(self, pool_size=DOWNLOAD_POOL_SIZE, max_retries=DOWNLOAD_MAX_RETRIES,
+                 backoff_factor=DOWNLOAD_BACKOFF_FACTOR, max_bytes=DOWNLOAD_MAX_BYTES,
+                 connect_timeout=DOWNLOAD_CONNECT_TIMEOUT_SEC, read_timeout=DOWNLOAD_READ_TIMEOUT_SEC,
+                 total_timeout=DOWNLOAD_TOTAL_TIMEOUT_SEC):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_bytes = max_bytes
+        self.timeout = (connect_timeout, read_timeout)
+        self.total_timeout = total_timeout
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+
+    def _build_session(self):
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _get_session(self):
+        with self._lock:
+            # Sockets must not be shared with a forked parent (gunicorn/Celery workers)
+            if self._session is None or self._session_pid != os.getpid():
+                self._session = self._build_session()
+                self._session_pid = os.getpid()
+            return self._session
+
+    def _read_local(self, url):
+        # file:// URLs come from the local resume storage backend
+        path = url[len("file://"):]
+        try:
+            if os.path.getsize(path) > self.max_bytes:
+                raise DownloadTooLarge(f"File exceeds {self.max_bytes} bytes: {url}")
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError as e:
+            raise DownloadError(f"Failed to read {url}: {str(e)}") from e
+
+    def download(self, url):
+        """Return the response body as bytes, or raise DownloadError."""
+        if url.startswith("file://"):
+            return self._read_local(url)
+
+        started = time.monotonic()
+        try:
+            with self._get_session().get(url, stream=True, timeout=self.timeout) as response:
+                if response.status_code != 200:
+                    raise DownloadError(f"Failed to download {url}: HTTP {response.status_code}")
+
+                content_length = response.headers.get("Content-Length")
+                if content_length and int(content_length) > self.max_bytes:
+                    raise DownloadTooLarge(f"File too large ({content_length} bytes): {url}")
+
+                buffer = io.BytesIO()
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                    if buffer.tell() + len(chunk) > self.max_bytes:
+                        raise DownloadTooLarge(f"File exceeds {self.max_bytes} bytes: {url}")
+                    if time.monotonic() - started > self.total_timeout:
+                        raise DownloadError(f"Download exceeded {self.total_timeout}s: {url}")
+                    buffer.write(chunk)
+                return buffer.getvalue()
+        except requests.RequestException as e:
+            raise DownloadError(f"Failed to download {url}: {str(e)}") from e
+
+
+# Process-wide shared client
+download_client = DownloadClient()
@@ -0,0 +1,161 @@
+import math
+import re
+
+# Local BM25 ranking of resumes against a drive's skills, used by
+# ResumeShortlistingAgent to score the most promising candidates first.
+
+# Each skill also matches these alternative spellings
+SKILL_SYNONYMS = {
+    "javascript": ["js", "ecmascript", "es6"],
+    "typescript": ["ts"],
+    "python": ["py", "python3"],
+    "react": ["reactjs", "react.js"],
+    "node": ["nodejs", "node.js"],
+    "nodejs": ["node", "node.js"],
+    "express": ["expressjs", "express.js"],
+    "angular": ["angularjs"],
+    "vue": ["vuejs", "vue.js"],
+    "next.js": ["nextjs"],
+    "mongodb": ["mongo"],
+    "postgresql": ["postgres", "psql"],
+    "mysql": ["sql"],
+    "sql": ["mysql", "postgresql", "sqlite"],
+    "c++": ["cpp"],
+    "c#": ["csharp", ".net"],
+    "go": ["golang"],
+    "kubernetes": ["k8s"],
+    "docker": ["containers", "containerization"],
+    "aws": ["amazon web services", "ec2", "s3", "lambda"],
+    "gcp": ["google cloud"],
+    "azure": ["microsoft azure"],
+    "machine learning": ["ml", "scikit-learn", "sklearn"],
+    "deep learning": ["dl", "pytorch", "tensorflow", "keras"],
+    "artificial intelligence": ["ai"],
+    "natural language processing": ["nlp"],
+    "computer vision": ["opencv"],
+    "ci/cd": ["continuous integration", "github actions", "jenkins"],
+    "rest": ["restful", "rest api"],
+    "html": ["html5"],
+    "css": ["css3", "tailwind", "sass"],
+    "data structures": ["dsa", "algorithms"],
+    "flask": ["flask api"],
+    "django": ["django rest framework", "drf"],
+    "spring": ["spring boot", "springboot"],
+    "git": ["github", "gitlab"]
+}
+
+# A resume naming a stack has each of its parts; a skill naming a stack matches its parts
+SKILL_STACKS = {
+    "mern": ["mongodb", "express", "react", "node"],
+    "mean": ["mongodb", "express", "angular", "node"],
+    "mevn": ["mongodb", "express", "vue", "node"],
+    "lamp": ["linux", "apache", "mysql", "php"]
+}
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9+#./-]+")
+
+
+def _normalize(text):
+    return " ".join(TOKEN_PATTERN.findall((text or "").lower()))
+
+
+def _variant_pattern(variant):
+    # Word boundaries that also work for terms like "c++", "c#" and ".net"
+    return re.compile(r"(?<![a-z0-9+#])" + re.escape(variant) + r"(?![a-z0-9+#])")
+
+
+def _skill_key(skill):
+    # "Node.js", "node js" and "NodeJS" all look up the same entry
+    return re.sub(r"[\s._-]", "", _normalize(skill))
+
+
+def _build_synonym_index():
+    """Map every spelling in SKILL_SYNONYMS (skill or synonym) to the skill's synonym group."""
+    index = {}
+    for skill, synonyms in SKILL_SYNONYMS.items():
+        index[_skill_key(skill)] = [skill] + synonyms
+    # Synonyms only fill gaps, so "sql" keeps its own entry rather than becoming "mysql"
+    for skill, synonyms in SKILL_SYNONYMS.items():
+        for synonym in synonyms:
+            index.setdefault(_skill_key(synonym), [skill] + synonyms)
+    return index
+
+
+SYNONYM_INDEX = _build_synonym_index()
+
+
+def expand_skill(skill):
+    skill = _normalize(skill)
+    key = _skill_key(skill)
+    variants = list(SYNONYM_INDEX.get(key, []))
+    group = {_skill_key(variant) for variant in variants} | {key}
+    variants += [stack for stack, parts in SKILL_STACKS.items() if group & {_skill_key(part) for part in parts}]
+    for part in SKILL_STACKS.get(key, []):
+        variants += SYNONYM_INDEX.get(_skill_key(part), [part])
+
+    expanded = [skill]
+    skill_pattern = _variant_pattern(skill)
+    for variant in variants:
+        variant = _normalize(variant)
+        # "flask api" already counts as a "flask" match; counting it again would double the tf
+        if variant not in expanded and not skill_pattern.search(variant):
+            expanded.append(variant)
+    return expanded
+
+
+class LexicalRanker:
+    """BM25 over a set of documents where each query term is a skill plus its synonyms."""
+
+    def __init__(self, skills):
+        if isinstance(skills, str):
+            skills = skills.split(",")
+        self.skills = list(dict.fromkeys(_normalize(skill) for skill in skills or [] if _normalize(skill)))
+        self.patterns = {
+            skill: [_variant_pattern(variant) for variant in expand_skill(skill)]
+            for skill in self.skills
+        }
+
+    def _term_frequencies(self, text):
+        return {
+            skill: sum(len(pattern.findall(text)) for pattern in patterns)
+            for skill, patterns in self.patterns.items()
+        }
+
+    def rank(self, documents):
+        """
+        Score documents ({doc_id: text}) against the skills.
+        Returns {doc_id: {"bm25": float, "coverage": float, "matched": [skills]}}.
+        coverage is the fraction of skills present at least once.
+        """
+        normalized = {doc_id: _normalize(text) for doc_id, text in documents.items()}
+        frequencies = {doc_id: self._term_frequencies(text) for doc_id, text in normalized.items()}
+        lengths = {doc_id: len(text.split()) for doc_id, text in normalized.items()}
+
+        total_docs = len(documents)
+        avg_length = (sum(lengths.values()) / total_docs) if total_docs else 0
+        document_frequency = {
+            skill: sum(1 for tf in frequencies.values() if tf[skill] > 0)
+            for skill in self.skills
+        }
+
+        rankings = {}
+        for doc_id, tf in frequencies.items():
+            score = 0.0
+            for skill in self.skills:
+                if not tf[skill]:
+                    continue
+                df = document_frequency[skill]
+                idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                length_norm = 1 - BM25_B + BM25_B * (lengths[doc_id] / avg_length if avg_length else 1)
+                score += idf * tf[skill] * (BM25_K1 + 1) / (tf[skill] + BM25_K1 * length_norm)
+
+            matched = [skill for skill in self.skills if tf[skill]]
+            rankings[doc_id] = {
+                "bm25": round(score, 4),
+                "coverage": round(len(matched) / len(self.skills), 4) if self.skills else 1.0,
+                "matched": matched
+            }
+        return rankings
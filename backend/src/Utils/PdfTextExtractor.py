@@ -0,0 +1,129 @@
+import io
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PDF_EXTRACT_BACKEND = os.getenv("PDF_EXTRACT_BACKEND", "pymupdf")
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 2))
+PDF_EXTRACT_TIMEOUT_SEC = float(os.getenv("PDF_EXTRACT_TIMEOUT_SEC", 30))
+PDF_EXTRACT_MAX_PAGES = int(os.getenv("PDF_EXTRACT_MAX_PAGES", 20))
+
+
+class PdfExtractionError(RuntimeError):
+    pass
+
+
+class PdfExtractionTimeout(PdfExtractionError):
+    pass
+
+
+# Backends run inside the worker processes, so they must stay module-level functions.
+
+def _extract_pymupdf(pdf_bytes, max_pages):
+    import fitz
+
+    text = ""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf:
+        for page_number, page in enumerate(pdf):
+            if page_number >= max_pages:
+                break
+            text += page.get_text()
+    return text.strip()
+
+
+def _extract_pdfplumber(pdf_bytes, max_pages):
+    import pdfplumber
+
+    text = ""
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages[:max_pages]:
+            page_text = page.extract_text()
+            if page_text:
+                text += page_text + "\n"
+    return text.strip()
+
+
+BACKENDS = {
+    "pymupdf": _extract_pymupdf,
+    "pdfplumber": _extract_pdfplumber
+}
+
+
+class PdfTextExtractor:
+    """
+    Shared PDF text extraction service backed by a process pool.
+
+    Parsing is CPU-bound and holds the GIL, so it runs in worker processes and
+    scales across cores instead of blocking the request or worker thread.
+    Each document gets a timeout and a page cap. Inside daemonic processes
+    (Celery prefork children) child processes are not allowed, so extraction
+    falls back to a thread with the same timeout.
+    """
+
+    def __init__(self, backend=PDF_EXTRACT_BACKEND, max_workers=PDF_EXTRACT_WORKERS,
+                 timeout=PDF_EXTRACT_TIMEOUT_SEC, max_pages=PDF_EXTRACT_MAX_PAGES):
+        if backend not in BACKENDS:
+            raise ValueError(f"Invalid PDF backend '{backend}'. Must be one of: {list(BACKENDS.keys())}")
+        self.backend = backend
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            # A pool inherited through fork belongs to the parent; build a fresh one
+            if self._executor is None or self._executor_pid != os.getpid():
+                if multiprocessing.current_process().daemon:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _reset_executor(self, executor):
+        """Drop a broken or stuck pool so the next call starts a fresh one."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+
+        if isinstance(executor, ProcessPoolExecutor):
+            # Kill workers still chewing on a document that timed out
+            for process in list(getattr(executor, "_processes", {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def extract(self, pdf_bytes, backend=None):
+        """Return the text of the first max_pages pages of the PDF."""
+        extract_fn = BACKENDS[backend or self.backend]
+
+        for attempt in range(2):
+            executor = self._get_executor()
+            future = executor.submit(extract_fn, pdf_bytes, self.max_pages)
+            try:
+                return future.result(timeout=self.timeout)
+            except TimeoutError:
+                self._reset_executor(executor)
+                raise PdfExtractionTimeout(f"PDF extraction exceeded {self.timeout}s")
+            except BrokenProcessPool:
+                # Pool was recycled by another caller's timeout; retry once on a new pool
+                self._reset_executor(executor)
+                if attempt:
+                    raise PdfExtractionError("PDF extraction worker pool crashed")
+            except Exception as e:
+                raise PdfExtractionError(f"Failed to extract PDF text: {str(e)}") from e
+
+
+# Process-wide shared extractor
+pdf_extractor = PdfTextExtractor()
@@ -0,0 +1,126 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PipelineStage:
+    """A named pipeline step with its own concurrency limit and throughput counters."""
+
+    def __init__(self, name, func, concurrency=1):
+        self.name = name
+        self.func = func
+        self.concurrency = max(1, int(concurrency))
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.first_started = None
+        self.last_finished = None
+
+    def record(self, started, finished, failed=False):
+        if self.first_started is None or started < self.first_started:
+            self.first_started = started
+        if self.last_finished is None or finished > self.last_finished:
+            self.last_finished = finished
+        self.busy_seconds += finished - started
+        if failed:
+            self.failed += 1
+        else:
+            self.processed += 1
+
+    def stats(self):
+        """Return per-stage counters; throughput is items per second of stage wall time."""
+        wall_seconds = 0.0
+        if self.first_started is not None:
+            wall_seconds = self.last_finished - self.first_started
+        handled = self.processed + self.failed
+        return {
+            "stage": self.name,
+            "concurrency": self.concurrency,
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wall_seconds": round(wall_seconds, 3),
+            "throughput_per_sec": round(handled / wall_seconds, 3) if wall_seconds > 0 else None,
+            "avg_latency_sec": round(self.busy_seconds / handled, 3) if handled else None
+        }
+
+
+class PipelineResult:
+    """Outcome of one item: either the final stage value or the error and the stage that raised it."""
+
+    def __init__(self, index, item, value=None, error=None, failed_stage=None):
+        self.index = index
+        self.item = item
+        self.value = value
+        self.error = error
+        self.failed_stage = failed_stage
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class StagedPipeline:
+    """
+    Run items through a sequence of stages concurrently.
+
+    Every item flows through the stages in order, but each stage only admits
+    `concurrency` items at a time, so a slow stage (e.g. the LLM call) does not
+    hold back downloads or parsing of the next items. Sync stage functions run
+    on a private thread pool; async stage functions are awaited directly.
+    A failing item stops at the stage that raised and does not affect the others.
+    on_result is called with each item's PipelineResult as it finishes; a sync
+    callback runs in a worker thread, so blocking I/O in it (progress writes)
+    does not stall the stages.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+
+    def run(self, items, on_result=None):
+        return asyncio.run(self.arun(items, on_result))
+
+    async def arun(self, items, on_result=None):
+        loop = asyncio.get_running_loop()
+        semaphores = [asyncio.Semaphore(stage.concurrency) for stage in self.stages]
+        sync_workers = sum(
+            stage.concurrency for stage in self.stages if not asyncio.iscoroutinefunction(stage.func)
+        )
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, sync_workers),
+            thread_name_prefix="pipeline"
+        )
+
+        async def run_item(index, item):
+            value = item
+            for stage, semaphore in zip(self.stages, semaphores):
+                async with semaphore:
+                    started = time.perf_counter()
+                    try:
+                        if asyncio.iscoroutinefunction(stage.func):
+                            value = await stage.func(value)
+                        else:
+                            value = await loop.run_in_executor(executor, stage.func, value)
+                    except Exception as e:
+                        stage.record(started, time.perf_counter(), failed=True)
+                        result = PipelineResult(index, item, error=e, failed_stage=stage.name)
+                        break
+                    stage.record(started, time.perf_counter())
+            else:
+                result = PipelineResult(index, item, value=value)
+
+            if on_result:
+                if asyncio.iscoroutinefunction(on_result):
+                    await on_result(result)
+                else:
+                    await asyncio.to_thread(on_result, result)
+            return result
+
+        try:
+            # gather keeps results in input order
+            return await asyncio.gather(*(run_item(i, item) for i, item in enumerate(items)))
+        finally:
+            executor.shutdown(wait=False)
+
+    def stats(self):
+        return [stage.stats() for stage in self.stages]
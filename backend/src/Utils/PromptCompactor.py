@@ -0,0 +1,160 @@
+import math
+import re
+import threading
+
+# Shrinks resume text before it goes into an LLM prompt: drops boilerplate and
+# repeated lines, then keeps whole sections in priority order (skills,
+# experience and projects first) until the token budget is used up.
+
+# Words, numbers and single punctuation marks; long words count as several BPE tokens
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+CHARS_PER_TOKEN = 4
+
+# Section headings, lower case, mapped to the section they start
+SECTION_HEADINGS = {
+    "skills": "skills", "technical skills": "skills", "key skills": "skills", "core skills": "skills",
+    "tech stack": "skills", "technologies": "skills", "core competencies": "skills", "tools": "skills",
+    "experience": "experience", "work experience": "experience", "professional experience": "experience",
+    "employment history": "experience", "internships": "experience", "internship": "experience",
+    "projects": "projects", "personal projects": "projects", "academic projects": "projects",
+    "key projects": "projects",
+    "summary": "summary", "profile": "summary", "professional summary": "summary",
+    "objective": "summary", "career objective": "summary", "about me": "summary",
+    "education": "education", "academic background": "education", "qualifications": "education",
+    "certifications": "certifications", "certificates": "certifications", "courses": "certifications",
+    "achievements": "achievements", "awards": "achievements", "accomplishments": "achievements",
+    "publications": "achievements", "positions of responsibility": "achievements",
+    "extracurricular activities": "other", "activities": "other", "volunteering": "other",
+    "languages": "other", "hobbies": "other", "interests": "other",
+    "references": "boilerplate", "declaration": "boilerplate", "personal details": "boilerplate",
+    "personal information": "boilerplate"
+}
+
+# Lower number = kept first. "header" is the text before the first heading (name, contact details)
+SECTION_PRIORITY = {
+    "header": 0,
+    "skills": 1,
+    "experience": 2,
+    "projects": 3,
+    "summary": 4,
+    "education": 5,
+    "certifications": 6,
+    "achievements": 7,
+    "other": 8
+}
+
+BOILERPLATE_PATTERNS = [
+    re.compile(r"^references?\s+(are\s+)?available\s+(up)?on\s+request", re.IGNORECASE),
+    re.compile(r"^i\s+hereby\s+declare", re.IGNORECASE),
+    re.compile(r"^page\s+\d+(\s+of\s+\d+)?$", re.IGNORECASE),
+    re.compile(r"^(curriculum\s+vitae|resume|cv)$", re.IGNORECASE),
+    re.compile(r"^[\W_]+$")  # separator rules like "-----" or "• • •"
+]
+
+
+def count_tokens(text):
+    """Approximate number of model tokens in text."""
+    return sum(max(1, math.ceil(len(piece) / CHARS_PER_TOKEN)) for piece in TOKEN_PATTERN.findall(text or ""))
+
+
+def _section_of(line):
+    heading = " ".join(re.sub(r"[^a-z ]", " ", line.lower()).split())
+    if len(heading.split()) > 4:
+        return None
+    return SECTION_HEADINGS.get(heading)
+
+
+def _is_boilerplate(line):
+    return any(pattern.search(line) for pattern in BOILERPLATE_PATTERNS)
+
+
+def split_sections(text):
+    """Split resume text into [(section, [lines])] in document order, without boilerplate or repeated lines."""
+    sections = [("header", [])]
+    seen = set()
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+
+        section = _section_of(line)
+        if section:
+            sections.append((section, [line]))
+            continue
+        if sections[-1][0] == "boilerplate" or _is_boilerplate(line):
+            continue
+
+        # PDF extraction often repeats page headers/footers and whole lines
+        key = re.sub(r"\s+", " ", line.lower())
+        if key in seen:
+            continue
+        seen.add(key)
+        sections[-1][1].append(line)
+
+    return [(section, lines) for section, lines in sections if section != "boilerplate" and lines]
+
+
+class PromptCompactor:
+    """
+    Fits resume text into max_tokens. Keeps running totals of tokens before and
+    after compaction so callers can report the savings.
+    """
+
+    def __init__(self, max_tokens):
+        self.max_tokens = max_tokens
+        self.calls = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self._lock = threading.Lock()
+
+    def compact(self, text):
+        """Returns {"text", "tokens_before", "tokens_after", "dropped_sections"}."""
+        tokens_before = count_tokens(text)
+        sections = split_sections(text)
+
+        kept = []
+        dropped = []
+        used = 0
+        # Highest priority first; stable sort keeps document order within a priority
+        for section, lines in sorted(sections, key=lambda entry: SECTION_PRIORITY.get(entry[0], 9)):
+            section_lines = []
+            section_tokens = 0
+            for line in lines:
+                line_tokens = count_tokens(line) + 1  # + newline
+                if used + section_tokens + line_tokens > self.max_tokens:
+                    break
+                section_lines.append(line)
+                section_tokens += line_tokens
+
+            # A heading with no content left is not worth keeping
+            if len(section_lines) > (0 if section == "header" else 1):
+                kept.append("\n".join(section_lines))
+                used += section_tokens
+                if len(section_lines) < len(lines):
+                    dropped.append(f"{section} (truncated)")
+            else:
+                dropped.append(section)
+
+        compacted = "\n\n".join(kept)
+        tokens_after = count_tokens(compacted)
+        with self._lock:
+            self.calls += 1
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+
+        return {
+            "text": compacted,
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "dropped_sections": dropped
+        }
+
+    def stats(self):
+        saved = self.tokens_before - self.tokens_after
+        return {
+            "calls": self.calls,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": saved,
+            "saved_ratio": round(saved / self.tokens_before, 3) if self.tokens_before else 0.0
+        }
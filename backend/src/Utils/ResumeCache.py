@@ -0,0 +1,51 @@
+import hashlib
+from datetime import datetime
+from pymongo import ASCENDING
+from src.Utils.Database import db
+
+# Content-addressed cache of parsed resumes, keyed by the SHA-256 of the PDF bytes.
+# A repeat upload of the same file skips text extraction and the LLM call.
+try:
+    db.resume_cache.create_index([("content_hash", ASCENDING)], unique=True)
+except Exception as e:
+    print("Failed to create resume_cache index:", e)
+
+
+def hash_pdf(pdf_bytes):
+    """Return the hex SHA-256 digest of the raw PDF bytes."""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+class ResumeCache:
+    def __init__(self, collection=None):
+        self.collection = collection if collection is not None else db.resume_cache
+
+    def get(self, content_hash):
+        """Return the cached parse for this hash, or None on a miss."""
+        entry = self.collection.find_one(
+            {"content_hash": content_hash},
+            {"_id": 0, "raw_text": 1, "name": 1, "email": 1, "resume_content": 1}
+        )
+        if entry:
+            self.collection.update_one(
+                {"content_hash": content_hash},
+                {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}}
+            )
+        return entry
+
+    def put(self, content_hash, raw_text, name, email, resume_content):
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {"content_hash": content_hash},
+            {
+                "$set": {
+                    "raw_text": raw_text,
+                    "name": name,
+                    "email": email,
+                    "resume_content": resume_content,
+                    "last_used_at": now
+                },
+                "$setOnInsert": {"created_at": now, "hits": 0}
+            },
+            upsert=True
+        )
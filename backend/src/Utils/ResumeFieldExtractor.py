@@ -0,0 +1,107 @@
+import re
+import unicodedata
+
+# Deterministic extraction of the candidate name, email and cleaned resume text.
+# Runs before the LLM in ResumeIntakeAgent; the LLM is only asked when the
+# confidence returned here is too low.
+
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+PERSONAL_EMAIL_DOMAINS = ("gmail.com", "outlook.com", "hotmail.com", "yahoo.com", "icloud.com", "live.com")
+
+NAME_TOKEN_PATTERN = re.compile(r"^[^\W\d_](?:[^\W\d_]|['\-])*\.?$")
+HEADER_STOPWORDS = {
+    "resume", "curriculum", "vitae", "cv", "profile", "summary", "objective",
+    "education", "experience", "skills", "projects", "contact", "address", "phone",
+    "email", "linkedin", "github", "portfolio", "developer", "engineer", "student",
+    "intern", "manager", "analyst", "designer", "b.tech", "btech", "university"
+}
+HEADER_LINES_TO_SCAN = 6
+
+# Common typographic characters mapped to plain ASCII before filtering
+CHARACTER_REPLACEMENTS = {
+    "•": "-", "●": "-", "▪": "-", "‣": "-", "⁃": "-", "\uf0b7": "-",
+    "–": "-", "—": "-", "−": "-",
+    "‘": "'", "’": "'", "“": '"', "”": '"',
+    "…": "...", "\xa0": " ", "ﬁ": "fi", "ﬂ": "fl"
+}
+
+MIN_RESUME_LENGTH = 200
+
+
+def _keep_character(ch):
+    if ch in "\n\t" or " " <= ch <= "~":
+        return True
+    # Accented letters in names are real content; symbols and private-use glyphs are not
+    return unicodedata.category(ch)[0] in ("L", "M")
+
+
+def clean_resume_text(text):
+    """Keep printable text and newlines; drop decorative or corrupted characters."""
+    for source, target in CHARACTER_REPLACEMENTS.items():
+        text = text.replace(source, target)
+
+    text = "".join(ch for ch in text if _keep_character(ch))
+
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.splitlines()]
+    cleaned = "\n".join(lines)
+    # Collapse runs of blank lines left behind by PDF layout
+    cleaned = re.sub(r"\n{3,}", "\n\n", cleaned)
+    return cleaned.strip()
+
+
+def extract_email(text):
+    """Return the primary email, preferring personal providers when several are present."""
+    emails = EMAIL_PATTERN.findall(text)
+    if not emails:
+        return None
+
+    for email in emails:
+        if email.lower().split("@", 1)[1] in PERSONAL_EMAIL_DOMAINS:
+            return email
+    return emails[0]
+
+
+def extract_name(text):
+    """Take the name from the first header lines that look like a 2-4 word personal name."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+
+    for line in lines[:HEADER_LINES_TO_SCAN]:
+        # Names often share the header line with contact details: "John Doe | john@x.com"
+        candidate = re.split(r"[|,•]|\s{2,}", line)[0].strip()
+        if EMAIL_PATTERN.search(candidate) or any(ch.isdigit() for ch in candidate):
+            continue
+
+        tokens = candidate.split()
+        if not 2 <= len(tokens) <= 4:
+            continue
+        if any(token.lower().strip(".:") in HEADER_STOPWORDS for token in tokens):
+            continue
+        if all(token[0].isupper() and NAME_TOKEN_PATTERN.match(token) for token in tokens):
+            return candidate
+
+    return None
+
+
+def extract_fields(raw_text):
+    """
+    Extract name, email and cleaned resume_content without the LLM.
+    Returns a dict with those fields plus a confidence between 0 and 1.
+    """
+    resume_content = clean_resume_text(raw_text)
+    email = extract_email(resume_content)
+    name = extract_name(resume_content)
+
+    confidence = 0.0
+    if email:
+        confidence += 0.5
+    if name:
+        confidence += 0.4
+    if len(resume_content) >= MIN_RESUME_LENGTH:
+        confidence += 0.1
+
+    return {
+        "name": name,
+        "email": email,
+        "resume_content": resume_content,
+        "confidence": round(confidence, 2)
+    }
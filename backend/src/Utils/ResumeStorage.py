@@ -0,0 +1,83 @@
+import io
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.utils import secure_filename
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "cloudinary" (default) or "local"; local keeps files under backend/uploads/resumes
+RESUME_STORAGE_BACKEND = os.getenv("RESUME_STORAGE_BACKEND", "cloudinary")
+RESUME_UPLOAD_CONCURRENCY = int(os.getenv("RESUME_UPLOAD_CONCURRENCY", 8))
+LOCAL_RESUME_DIR = os.getenv(
+    "LOCAL_RESUME_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "uploads", "resumes")
+)
+
+
+class CloudinaryStorage:
+    def save(self, filename, data):
+        import cloudinary.uploader
+        from src.Config.cloudinary_config import cloudinary
+
+        # Upload PDF/DOC as raw file to Cloudinary
+        result = cloudinary.uploader.upload(
+            io.BytesIO(data),
+            resource_type="raw",
+            folder="resumes"
+        )
+        return result["secure_url"]
+
+
+class LocalStorage:
+    """Store resumes on the local filesystem; returns file:// URLs the intake download client can read."""
+
+    def __init__(self, directory=LOCAL_RESUME_DIR):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def save(self, filename, data):
+        path = os.path.join(self.directory, f"{uuid.uuid4().hex}_{filename}")
+        with open(path, "wb") as f:
+            f.write(data)
+        return "file://" + os.path.abspath(path)
+
+
+STORAGE_BACKENDS = {
+    "cloudinary": CloudinaryStorage,
+    "local": LocalStorage
+}
+
+
+def get_resume_storage(backend=None):
+    backend = backend or RESUME_STORAGE_BACKEND
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Invalid storage backend '{backend}'. Must be one of: {list(STORAGE_BACKENDS.keys())}")
+    return STORAGE_BACKENDS[backend]()
+
+
+def upload_resume_files(files, storage=None, max_workers=RESUME_UPLOAD_CONCURRENCY):
+    """
+    Upload files concurrently through a bounded thread pool.
+    files is a list of (filename, bytes). Returns one result per file, in the
+    original order: {"filename", "url"} on success or {"filename", "error"}.
+    """
+    storage = storage or get_resume_storage()
+
+    def upload(entry):
+        filename, data = entry
+        filename = secure_filename(filename) or "resume.pdf"
+        try:
+            print(f"Uploading {filename} to {type(storage).__name__}...")
+            return {"filename": filename, "url": storage.save(filename, data)}
+        except Exception as e:
+            print(f"❌ Failed to upload {filename}: {e}")
+            return {"filename": filename, "error": str(e)}
+
+    if not files:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as executor:
+        # map keeps results in submission order
+        return list(executor.map(upload, files))
@@ -0,0 +1,101 @@
+import hashlib
+import itertools
+import json
+import os
+from datetime import datetime
+from pymongo import ASCENDING
+from dotenv import load_dotenv
+from src.Utils.Database import db
+
+load_dotenv()
+
+SCORE_CACHE_TTL_SEC = int(os.getenv("SCORE_CACHE_TTL_SEC", 30 * 24 * 3600))  # 30 days
+SCORE_CACHE_MAX_ENTRIES = int(os.getenv("SCORE_CACHE_MAX_ENTRIES", 100000))
+# The cache's size is checked once every this many writes
+SCORE_CACHE_SIZE_CHECK_EVERY = int(os.getenv("SCORE_CACHE_SIZE_CHECK_EVERY", 100))
+
+# Expired entries are removed by Mongo's TTL monitor; size is bounded every few ScoreCache.put calls
+try:
+    db.shortlisting_score_cache.create_index([("cache_key", ASCENDING)], unique=True)
+    db.shortlisting_score_cache.create_index([("created_at", ASCENDING)], expireAfterSeconds=SCORE_CACHE_TTL_SEC)
+    db.shortlisting_score_cache.create_index([("last_used_at", ASCENDING)])
+except Exception as e:
+    print("Failed to create shortlisting_score_cache indexes:", e)
+
+
+def hash_text(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def normalize_keywords(keywords):
+    """Lower-case, de-duplicated, sorted keyword list; accepts a list or a comma separated string."""
+    if isinstance(keywords, str):
+        keywords = keywords.split(",")
+    return sorted({str(keyword).strip().lower() for keyword in keywords or [] if str(keyword).strip()})
+
+
+def build_score_key(resume_content, job_role, keywords, model_name, prompt_version):
+    """Cache key for one resume scored against one role/skill set by one model and prompt."""
+    payload = json.dumps({
+        "resume": hash_text(resume_content),
+        "role": (job_role or "").strip().lower(),
+        "keywords": normalize_keywords(keywords),
+        "model": model_name,
+        "prompt_version": prompt_version
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_score_fingerprint(resume_content, job_role, keywords):
+    """
+    Identifies what a drive candidate was last scored against, so incremental
+    shortlisting can skip candidates whose resume, role and skills are unchanged.
+    """
+    payload = json.dumps({
+        "resume": hash_text(resume_content),
+        "role": (job_role or "").strip().lower(),
+        "keywords": normalize_keywords(keywords)
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Shared by every ScoreCache: the agent creates one per shortlisting run
+_puts = itertools.count(1)
+
+
+class ScoreCache:
+    def __init__(self, collection=None, max_entries=SCORE_CACHE_MAX_ENTRIES, size_check_every=SCORE_CACHE_SIZE_CHECK_EVERY):
+        self.collection = collection if collection is not None else db.shortlisting_score_cache
+        self.max_entries = max_entries
+        self.size_check_every = max(1, size_check_every)
+
+    def get(self, cache_key):
+        """Return {"shortlisted", "score"} for a cached score, or None on a miss."""
+        entry = self.collection.find_one_and_update(
+            {"cache_key": cache_key},
+            {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}},
+            projection={"_id": 0, "shortlisted": 1, "score": 1}
+        )
+        return entry
+
+    def put(self, cache_key, shortlisted, score):
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {"cache_key": cache_key},
+            {
+                "$set": {"shortlisted": shortlisted, "score": score, "last_used_at": now},
+                "$setOnInsert": {"created_at": now, "hits": 0}
+            },
+            upsert=True
+        )
+        if next(_puts) % self.size_check_every == 0:
+            self._evict()
+
+    def _evict(self):
+        """Drop the least recently used entries once the cache grows past max_entries."""
+        excess = self.collection.estimated_document_count() - self.max_entries
+        if excess <= 0:
+            return
+
+        stale = self.collection.find({}, {"_id": 1}).sort("last_used_at", ASCENDING).limit(excess)
+        self.collection.delete_many({"_id": {"$in": [doc["_id"] for doc in stale]}})
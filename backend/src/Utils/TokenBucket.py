@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Refills at rate_per_minute tokens per minute up to capacity (a burst of
+    capacity tokens is allowed after an idle period). A rate of 0 or less
+    disables limiting.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_second = rate_per_minute / 60.0 if rate_per_minute and rate_per_minute > 0 else 0
+        self.capacity = capacity or max(1, rate_per_minute or 1)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.rate_per_second > 0
+
+    def _reserve(self, tokens):
+        """Take tokens if available; otherwise return the seconds to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+            self.updated_at = now
+
+            # A request larger than the bucket may proceed once the bucket is full
+            needed = min(tokens, self.capacity)
+            if self.tokens >= needed:
+                self.tokens -= tokens
+                return 0
+            return (needed - self.tokens) / self.rate_per_second
+
+    def consume(self, tokens):
+        """Take tokens without waiting; the balance may go negative, delaying later callers."""
+        if not self.enabled or tokens <= 0:
+            return
+        with self._lock:
+            self.tokens -= tokens
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available."""
+        if not self.enabled:
+            return
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, tokens=1):
+        """Wait without blocking the event loop until tokens are available."""
+        if not self.enabled:
+            return
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)